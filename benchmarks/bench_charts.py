@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fiscal_charts
+import fiscal_data
+import fiscal_store
+from synthetic import synthetic_frame
+
+
+# Every Center metric of the prepared dataset, selected the way the app does it
+def center_selection(raw):
+	type_store = fiscal_store.build_store(fiscal_data.prepare_dataset(raw))["Center"]
+	return type_store.select(type_store.metrics)
+
+
+# Both engines must produce the same frames, slider and layout decorations, and open on the
+# same date. The initial (pre-playback) traces are not compared, they are styled differently.
+def check_parity(express, direct):
+	assert express.layout.annotations[0].text == direct.layout.annotations[0].text
+	assert [f.name for f in express.frames] == [f.name for f in direct.frames]
+	for ef, df in zip(express.frames, direct.frames):
+		assert ef.layout.annotations[0].text == df.layout.annotations[0].text
+		assert len(ef.data) == len(df.data)
+		for et, dt in zip(ef.data, df.data):
+			assert et.name == dt.name and et.marker.color == dt.marker.color
+			assert list(et.y) == list(dt.y) and list(et.text) == list(dt.text)
+			assert np.allclose(np.asarray(et.x, dtype=float), np.asarray(dt.x, dtype=float))
+	assert np.allclose(express.layout.xaxis.range, direct.layout.xaxis.range)
+	assert express.layout.yaxis.categoryarray == direct.layout.yaxis.categoryarray
+	assert [s.label for s in express.layout.sliders[0].steps] == [s.label for s in direct.layout.sliders[0].steps]
+	assert [(s.x0, s.line.color) for s in express.layout.shapes] == [(s.x0, s.line.color) for s in direct.layout.shapes]
+
+
+def best_of(func, repeat=3):
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = func()
+		best = min(best, time.perf_counter() - start)
+	return best, result
+
+
+# Figure construction time of the express and direct engines (parity checked first)
+def main():
+	print(f"{'metrics':>8} {'years':>6} {'express s':>10} {'direct s':>9} {'speedup':>8}")
+	for metrics, years in ((1, 1), (1, 3), (3, 1), (3, 3)):
+		selection = center_selection(synthetic_frame(metrics=metrics, years=years))
+		express_time, express = best_of(lambda: fiscal_charts.build_figure(selection))
+		direct_time, direct = best_of(lambda: fiscal_charts.build_figure_direct(selection))
+		check_parity(express, direct)
+		print(f"{metrics:>7}x {years:>5}x {express_time:>10.3f} {direct_time:>9.3f} {express_time / direct_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fiscal_labels
+from synthetic import synthetic_frame
+
+
+def apply_labels(df):
+	return df.apply(lambda row: f"<b>{row['Value']:.2f} ({row['Date_str'][-4:]})</b>", axis=1)
+
+
+def vectorized_labels(df):
+	return fiscal_labels.value_labels(df['Value'].to_numpy(), fiscal_labels.year_strings(df['Date'].to_numpy()))
+
+
+def best_of(func, df, repeat):
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = func(df)
+		best = min(best, time.perf_counter() - start)
+	return best, result
+
+
+# Rows/sec of the row-wise apply path against the vectorized builder at 1x, 10x and 100x the sheet size
+def main():
+	print(f"{'scale':>6} {'rows':>9} {'apply rows/s':>14} {'vectorized rows/s':>18} {'speedup':>8}")
+	for scale in (1, 10, 100):
+		df = synthetic_frame(rows=scale)
+		df['Value'] = df['Value'].round(2)
+		df['Date_str'] = df['Date'].dt.strftime('31st Mar %Y')
+
+		repeat = 5 if scale < 100 else 1
+		apply_time, expected = best_of(apply_labels, df, repeat)
+		vector_time, labels = best_of(vectorized_labels, df, repeat)
+		assert (expected.to_numpy(dtype=str) == labels).all()
+
+		print(f"{scale:>5}x {len(df):>9} {len(df) / apply_time:>14,.0f} {len(df) / vector_time:>18,.0f} {apply_time / vector_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
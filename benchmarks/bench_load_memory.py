@@ -0,0 +1,70 @@
+import argparse
+import importlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+import fiscal_data
+from bench_pipeline import SYNTHETIC_PASSWORD, decrypt, write_workbook
+from synthetic import synthetic_frame
+
+
+# The old loadfile(): whole workbook decrypted into a BytesIO, then pd.read_excel on it
+def load_bytesio(path, password):
+	return pd.read_excel(io.BytesIO(decrypt(path, password)), sheet_name=fiscal_data.SHEET)
+
+
+def load_streaming(path, password):
+	return fiscal_data.read_workbook(path, password)
+
+
+LOADERS = {"bytesio": load_bytesio, "streaming": load_streaming}
+
+
+# Runs in a fresh interpreter so each loader starts from the same RSS: prints the peak RSS
+# growth (MB) the load caused over the imports, and its wall time (s)
+def child(loader, path, password):
+	# Imported before the baseline is taken, so their import memory is not counted as load memory
+	for module in ("msoffcrypto", "openpyxl"):
+		importlib.import_module(module)
+
+	before = fiscal_data.peak_rss()
+	start = time.perf_counter()
+	df = LOADERS[loader](path, password)
+	elapsed = time.perf_counter() - start
+	print(len(df), (fiscal_data.peak_rss() - before) / 2**20, elapsed)
+
+
+# Peak RSS added by loading encrypted synthetic workbooks of 1x, 10x and 100x the sheet's rows
+def main():
+	parser = argparse.ArgumentParser(description="Compare peak RSS of the BytesIO and streaming workbook loads.")
+	parser.add_argument("--child", nargs=3, metavar=("LOADER", "PATH", "PASSWORD"), help=argparse.SUPPRESS)
+	parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100])
+	args = parser.parse_args()
+	if args.child:
+		child(*args.child)
+		return
+
+	print(f"{'scale':>6} {'rows':>9} {'workbook MB':>12} {'loader':>10} {'peak RSS +MB':>13} {'seconds':>8}")
+	with tempfile.TemporaryDirectory() as tmp:
+		for scale in args.scales:
+			path = os.path.join(tmp, f"synthetic-{scale}.xlsx")
+			write_workbook(synthetic_frame(rows=scale), path, SYNTHETIC_PASSWORD)
+			size = os.path.getsize(path) / 2**20
+			for loader in LOADERS:
+				result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", loader, path, SYNTHETIC_PASSWORD],
+										capture_output=True, text=True, check=True)
+				rows, rss, seconds = result.stdout.split()
+				print(f"{scale:>5}x {int(rows):>9} {size:>12.1f} {loader:>10} {float(rss):>13.1f} {float(seconds):>8.2f}")
+
+
+if __name__ == "__main__":
+	main()
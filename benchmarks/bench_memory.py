@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import fiscal_data
+import fiscal_labels
+import fiscal_store
+from synthetic import synthetic_frame
+
+
+# The frame as the app used to hold it: object strings for Type, Metric, Date_str and a
+# per-row HTML Text label, float64 values
+def legacy_dataset(raw):
+	df = raw.assign(Date=pd.to_datetime(raw['Date'])).sort_values(by='Date')
+	df['Date_str'] = df['Date'].dt.strftime('31st Mar %Y')
+	df['Value'] = df['Value'].astype(float).round(2)
+	df['Text'] = fiscal_labels.value_labels(df['Value'].to_numpy(), fiscal_labels.year_strings(df['Date'].to_numpy()))
+	return df.astype({'Type': object, 'Metric': object, 'Date_str': object, 'Text': object})
+
+
+# What one session of the old app copied per rerun: the rows of the selected Type and metrics
+def legacy_session(df):
+	filtered = df[df['Type'] == "Center"]
+	return filtered[filtered['Metric'].isin(fiscal_data.center_order)]
+
+
+# Bytes per row of the shared dataset before and after the compact dtypes, and what one
+# session holds per chart: the old filtered frame copy against a store selection (0 when
+# the selection is a view of the shared store)
+def main():
+	print(f"{'scale':>6} {'rows':>9} {'layout':>8} {'bytes/row':>10} {'dataset MB':>11} {'per session KB':>15}")
+	for scale in (1, 10, 100):
+		raw = synthetic_frame(rows=scale)
+
+		legacy = legacy_dataset(raw)
+		report = fiscal_data.memory_report(legacy)
+		session = fiscal_data.memory_report(legacy_session(legacy))["bytes"]
+		print(f"{scale:>5}x {report['rows']:>9} {'legacy':>8} {report['bytes_per_row']:>10.1f} {report['bytes'] / 2**20:>11.2f} {session / 1024:>15.1f}")
+
+		compact = fiscal_data.prepare_dataset(raw)
+		report = fiscal_data.memory_report(compact)
+		type_store = fiscal_store.build_store(compact)["Center"]
+		selection = type_store.select(type_store.default_metrics)
+		session = selection.values.nbytes if not np.shares_memory(selection.values, type_store.values) else 0
+		print(f"{scale:>5}x {report['rows']:>9} {'compact':>8} {report['bytes_per_row']:>10.1f} {report['bytes'] / 2**20:>11.2f} {session / 1024:>15.1f}")
+
+		for column, size in report["columns"].items():
+			print(f"{'':>17} {column:>8} {size / report['rows']:>10.1f}")
+
+
+if __name__ == "__main__":
+	main()
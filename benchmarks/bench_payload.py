@@ -0,0 +1,41 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fiscal_charts
+from bench_charts import center_selection
+from synthetic import synthetic_frame
+
+# Slow client link used to turn payload size into a transfer time (1.5 Mbit/s)
+LINK_BYTES_PER_SEC = 1.5e6 / 8
+
+
+# Payload bytes of the express, direct and compact figures, plus the time to first paint
+# the server side can account for: serialization, transfer of the gzip payload over a slow
+# link and JSON parsing (browser rendering itself cannot be measured headless)
+def main():
+	print(f"{'metrics':>8} {'years':>6} {'engine':>8} {'bytes':>10} {'gzip':>9} {'serialize ms':>13} {'transfer ms':>12} {'parse ms':>9} {'first paint ms':>15}")
+	for metrics, years in ((1, 1), (1, 3), (3, 3)):
+		selection = center_selection(synthetic_frame(metrics=metrics, years=years))
+		for engine, build in fiscal_charts.ENGINES.items():
+			fig = build(selection)
+
+			start = time.perf_counter()
+			figure_json = fig.to_json()
+			serialize = time.perf_counter() - start
+
+			start = time.perf_counter()
+			json.loads(figure_json)
+			parse = time.perf_counter() - start
+
+			report = fiscal_charts.payload_report(figure_json)
+			transfer = report["gzip_bytes"] / LINK_BYTES_PER_SEC
+			first_paint = serialize + transfer + parse
+			print(f"{metrics:>7}x {years:>5}x {engine:>8} {report['bytes']:>10,} {report['gzip_bytes']:>9,} {serialize * 1000:>13.1f} {transfer * 1000:>12.1f} {parse * 1000:>9.1f} {first_paint * 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,217 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+import fiscal_charts
+import fiscal_data
+import fiscal_ingest
+import fiscal_labels
+import fiscal_reload
+import fiscal_store
+from synthetic import synthetic_frame
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Synthetic datasets as (rows, metrics, years) multiples of the base sheet
+DATASETS = {
+	"synthetic 1x": (1, 1, 1),
+	"rows 10x": (10, 1, 1),
+	"rows 100x": (100, 1, 1),
+	"metrics 10x": (1, 10, 1),
+	"years 10x": (1, 1, 10),
+}
+
+# Password of the encrypted workbooks written for the synthetic datasets
+SYNTHETIC_PASSWORD = "benchmark"
+
+# A stage counts as a regression when it is this much slower, and by more than the noise floor
+REGRESSION_RATIO = 1.2
+NOISE_FLOOR_MS = 5.0
+
+
+# Encrypted workbook holding a synthetic frame, the same format as goi-fiscal-indicators.xlsx
+def write_workbook(df, path, password):
+	from msoffcrypto.format.ooxml import OOXMLFile
+
+	plain = io.BytesIO()
+	df.to_excel(plain, sheet_name=fiscal_data.SHEET, index=False)
+	plain.seek(0)
+	with open(path, 'wb') as f:
+		OOXMLFile(plain).encrypt(password, f)
+
+
+def decrypt(path, password):
+	import msoffcrypto
+
+	content = io.BytesIO()
+	with open(path, 'rb') as f:
+		excel = msoffcrypto.OfficeFile(f)
+		excel.load_key(password)
+		excel.decrypt(content)
+	return content.getvalue()
+
+
+# Best wall time over repeat runs, then one more run under tracemalloc for the peak
+# Python/NumPy allocation of the stage (tracing slows it down, so it is not timed)
+def measure(func, repeat):
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = func()
+		best = min(best, time.perf_counter() - start)
+
+	tracemalloc.start()
+	try:
+		func()
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+	return result, {"ms": round(best * 1000, 3), "peak_mb": round(peak / 2**20, 3)}
+
+
+# Time every stage from the encrypted workbook to the figure JSON of the default Center view.
+# decrypt and read_excel are the in-memory BytesIO path; read_workbook is the streaming load.
+# The px.scatter and frame annotation stages repeat those two steps of the express engine on
+# their own; "figure" is the whole engine, including them.
+def run_pipeline(path, password, engine, repeat):
+	import plotly.express as px
+	import plotly.graph_objects as go
+
+	stages = {}
+
+	def stage(name, func):
+		result, stages[name] = measure(func, repeat)
+		return result
+
+	content = stage("decrypt", lambda: decrypt(path, password))
+	stage("read_excel", lambda: pd.read_excel(io.BytesIO(content), sheet_name=fiscal_data.SHEET))
+	# The app's load: decryption to a spooled file and a streaming parse
+	raw = stage("read_workbook", lambda: fiscal_data.read_workbook(path, password))
+	raw = stage("validate", lambda: fiscal_ingest.validate_schema(raw, path))
+	df = stage("prepare", lambda: fiscal_reload.prepare(raw))
+	store = stage("metric store", lambda: fiscal_store.build_store(df))
+
+	type_store = store["Center"] if "Center" in store else next(iter(store.values()))
+	selection = stage("select", lambda: type_store.select(type_store.default_metrics))
+	frame = stage("to_frame", selection.to_frame)
+	fig = stage("px.scatter", lambda: px.scatter(frame, x="Value", y="Metric", animation_frame="Date_str",
+												 animation_group="Metric", color="Metric", size_max=24, text="Text"))
+
+	def annotate():
+		names = [fig_frame.name for fig_frame in fig.frames]
+		for fig_frame, text in zip(fig.frames, fiscal_labels.date_annotations(names).tolist()):
+			fig_frame['layout'].update(annotations=[go.layout.Annotation(**fiscal_charts.date_annotation(text, 30))])
+	stage("frame annotations", annotate)
+
+	fig = stage(f"figure ({engine})", lambda: fiscal_charts.ENGINES[engine](selection))
+	figure_json = stage("to_json", fig.to_json)
+
+	shape = {"rows": len(raw), "metrics": len(selection.metrics), "years": len(selection.years),
+			 "figure_bytes": len(figure_json.encode("utf-8"))}
+	return shape, stages
+
+
+def git_commit():
+	try:
+		commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+		dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+	return commit + ("-dirty" if dirty else "")
+
+
+def environment():
+	import numpy
+	import plotly
+
+	return {"python": platform.python_version(), "platform": platform.platform(), "pandas": pd.__version__,
+			"numpy": numpy.__version__, "plotly": plotly.__version__}
+
+
+def report(name, result):
+	shape = result["shape"]
+	print(f"{name}: {shape['rows']:,} rows, {shape['metrics']} metrics x {shape['years']} years, {shape['figure_bytes']:,} figure bytes")
+	for stage, timing in result["stages"].items():
+		print(f"  {stage:<20} {timing['ms']:>11.1f} ms {timing['peak_mb']:>10.1f} MB peak")
+
+
+# Stage timings against an earlier results file; returns the stages that regressed
+def compare(results, baseline):
+	regressions = []
+	print(f"Compared with {baseline.get('commit')} ({baseline.get('created')})")
+	print(f"  {'dataset':<14} {'stage':<20} {'before ms':>11} {'after ms':>11} {'ratio':>7}")
+	for name, result in results["datasets"].items():
+		before = baseline["datasets"].get(name)
+		if before is None:
+			continue
+		for stage, timing in result["stages"].items():
+			if stage not in before["stages"]:
+				continue
+			old, new = before["stages"][stage]["ms"], timing["ms"]
+			ratio = new / old if old else float("inf")
+			regressed = ratio > REGRESSION_RATIO and new - old > NOISE_FLOOR_MS
+			if regressed:
+				regressions.append((name, stage))
+			print(f"  {name:<14} {stage:<20} {old:>11.1f} {new:>11.1f} {ratio:>6.2f}x{'  REGRESSION' if regressed else ''}")
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Time each stage of the load -> prepare -> figure -> serialize pipeline.")
+	parser.add_argument("--datasets", nargs="+", default=["real"] + list(DATASETS),
+						help="real and/or synthetic datasets: " + ", ".join(f'"{name}"' for name in DATASETS))
+	parser.add_argument("--engine", default="express", choices=list(fiscal_charts.ENGINES))
+	parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best is kept (1 for workbooks over 2 MB)")
+	parser.add_argument("--out", help="results file (default benchmarks/results/pipeline-<commit>.json)")
+	parser.add_argument("--compare", help="earlier results file; exits 1 when a stage regressed")
+	args = parser.parse_args()
+
+	results = {"commit": git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "engine": args.engine,
+			   "environment": environment(), "datasets": {}}
+
+	with tempfile.TemporaryDirectory() as tmp:
+		for name in args.datasets:
+			if name == "real":
+				path = os.path.join(ROOT, fiscal_data.WORKBOOK)
+				try:
+					password = fiscal_data.read_password(os.path.join(ROOT, ".streamlit", "secrets.toml"))
+				except (OSError, KeyError):
+					print("real: skipped, no DB_PASSWORD or .streamlit/secrets.toml")
+					continue
+			else:
+				rows, metrics, years = DATASETS[name]
+				path, password = os.path.join(tmp, "synthetic.xlsx"), SYNTHETIC_PASSWORD
+				write_workbook(synthetic_frame(rows, metrics, years), path, password)
+
+			repeat = args.repeat if os.path.getsize(path) < 2**21 else 1
+			shape, stages = run_pipeline(path, password, args.engine, repeat)
+			results["datasets"][name] = {"shape": shape, "repeat": repeat, "stages": stages}
+			report(name, results["datasets"][name])
+
+	out = args.out or os.path.join(RESULTS_DIR, f"pipeline-{results['commit'] or 'unknown'}.json")
+	os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+	with open(out, 'w') as f:
+		json.dump(results, f, indent=1)
+	print(f"Results written to {out}")
+
+	if args.compare:
+		with open(args.compare) as f:
+			regressions = compare(results, json.load(f))
+		if regressions:
+			sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
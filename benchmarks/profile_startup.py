@@ -0,0 +1,119 @@
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APP = os.path.join(ROOT, "fiscal-indicators.py")
+
+# Modules the app only loads on the path that needs them
+LAZY_MODULES = ["msoffcrypto", "plotly.graph_objects", "plotly.express"]
+
+
+# Modules the app script imports at startup, read from its top-level import statements
+def startup_modules(path=APP):
+	with open(path) as f:
+		tree = ast.parse(f.read())
+	modules = []
+	for node in tree.body:
+		if isinstance(node, ast.Import):
+			modules += [alias.name for alias in node.names]
+		elif isinstance(node, ast.ImportFrom) and node.module:
+			modules.append(node.module)
+	return list(dict.fromkeys(modules))
+
+
+# Top-level (module, cumulative ms) pairs python -X importtime reports for one import statement
+def _importtime(statement):
+	result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+							cwd=ROOT, capture_output=True, text=True)
+	for line in result.stderr.splitlines():
+		parts = line.split("|")
+		if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2][1:].startswith(" "):
+			yield parts[2].strip(), int(parts[1]) / 1000
+
+
+# Cumulative import time (ms) of each module in a fresh interpreter, then of the whole set
+# imported together in one interpreter, where shared dependencies are only paid once
+def import_times(modules):
+	times = {}
+	for module in modules:
+		for name, ms in _importtime(f"import {module}"):
+			if name == module:
+				times[module] = ms
+	times["all of the above"] = sum(ms for _, ms in _importtime("; ".join(f"import {module}" for module in modules)))
+	return times
+
+
+def timed(timings, name, func):
+	start = time.perf_counter()
+	result = func()
+	timings[name] = (time.perf_counter() - start) * 1000
+	return result
+
+
+# Stage timings (ms) from a cold process to the first figure JSON, on the real workbook when
+# the password is available, otherwise on a synthetic dataset of the same shape
+def first_render(engine):
+	import fiscal_charts
+	import fiscal_data
+	import fiscal_store
+
+	timings = {}
+	try:
+		password = fiscal_data.read_password()
+		workbook = os.path.join(ROOT, fiscal_data.WORKBOOK)
+		with tempfile.TemporaryDirectory() as cache_dir:
+			_, raw = timed(timings, "load (cold cache)", lambda: fiscal_data.load_workbook(workbook, password, cache_dir=cache_dir))
+			timed(timings, "load (snapshot)", lambda: fiscal_data.load_workbook(workbook, password, cache_dir=cache_dir))
+	except (OSError, KeyError):
+		from synthetic import synthetic_frame
+		raw = timed(timings, "synthetic data", synthetic_frame)
+
+	df = timed(timings, "prepare", lambda: fiscal_data.prepare_dataset(raw))
+	store = timed(timings, "metric store", lambda: fiscal_store.build_store(df))
+	type_store = next(iter(store.values()))
+	selection = timed(timings, "select", lambda: type_store.select(type_store.metrics))
+	fig = timed(timings, f"build ({engine})", lambda: fiscal_charts.ENGINES[engine](selection))
+	timed(timings, "to_json", fig.to_json)
+	return timings
+
+
+# Wall time of the first full script run of the app, headless through streamlit's AppTest
+def app_first_run():
+	from streamlit.testing.v1 import AppTest
+
+	app = AppTest.from_file(os.path.join(ROOT, "fiscal-indicators.py"), default_timeout=600)
+	if os.environ.get("DB_PASSWORD"):
+		app.secrets["db_password"] = os.environ["DB_PASSWORD"]
+	start = time.perf_counter()
+	app.run()
+	return (time.perf_counter() - start) * 1000
+
+
+def report(title, timings):
+	print(title)
+	for name, ms in timings.items():
+		print(f"  {name:<28} {ms:>9.1f} ms")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Report import and first-render timings of the app.")
+	parser.add_argument("--engine", default="express")
+	parser.add_argument("--app", action="store_true", help="also time a full first run of fiscal-indicators.py")
+	args = parser.parse_args()
+
+	report("Startup imports", import_times(startup_modules()))
+	report("Lazy imports (paid on first use)", import_times(LAZY_MODULES))
+	report("First render", first_render(args.engine))
+	if args.app:
+		report("App", {"first script run": app_first_run()})
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from fiscal_data import center_order, state_order
+
+# Roughly the shape of goi-fiscal-indicators.xlsx: every metric of both Types, one value per fiscal year
+BASE_YEARS = range(1991, 2025)
+
+
+# Long-format frame with the workbook's columns (Date, Type, Metric, Value).
+# rows repeats the whole sheet, metrics adds extra metrics per Type and years
+# extends the history backwards, each as a multiple of the base sheet.
+def synthetic_frame(rows=1, metrics=1, years=1, seed=0):
+	rng = np.random.default_rng(seed)
+	last = BASE_YEARS[-1]
+	year_list = list(range(last - len(BASE_YEARS) * years + 1, last + 1))
+
+	frames = []
+	for type_name, order in (("Center", center_order), ("State", state_order)):
+		names = list(order) + [f"{name} #{k}" for k in range(1, metrics) for name in order]
+		dates = pd.to_datetime([f"{year}-03-31" for year in year_list])
+		frames.append(pd.DataFrame({
+			'Date': np.tile(dates, len(names)),
+			'Type': type_name,
+			'Metric': np.repeat(names, len(year_list)),
+			'Value': rng.normal(3, 3, len(names) * len(year_list)),
+		}))
+	df = pd.concat(frames * rows, ignore_index=True)
+	return df.sample(frac=1, random_state=seed).reset_index(drop=True)
@@ -1,10 +1,18 @@
+import json
+import os
 import pandas as pd
-from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
-import io
-import msoffcrypto
+import streamlit.components.v1 as components
+import fiscal_cache
+import fiscal_charts
+import fiscal_client
+import fiscal_data
+import fiscal_export
+import fiscal_ingest
+import fiscal_prefetch
+import fiscal_reload
+import fiscal_store
+import fiscal_trace
 
 pd.set_option('display.max_columns', None)
 
@@ -25,226 +33,221 @@ hide_st_style = '''
 	'''
 st.markdown(hide_st_style, unsafe_allow_html=True)
 
-# Load file function
+# Workbook sheets to read (sources.toml, or Sheet1 of goi-fiscal-indicators.xlsx)
 @st.cache_resource
-def loadfile():
+def ingestor():
 	password = st.secrets["db_password"]
-	excel_content = io.BytesIO()
-	with open("goi-fiscal-indicators.xlsx", 'rb') as f:
-		excel = msoffcrypto.OfficeFile(f)
-		excel.load_key(password)
-		excel.decrypt(excel_content)
+	return fiscal_ingest.Ingestor(fiscal_ingest.read_sources(), password)
 
-	# Loading data from excel file
-	df = pd.read_excel(excel_content, sheet_name="Sheet1")
-	return df
-
-# Main Program Starts Here
-df = loadfile()
-
-# Ensuring the Date column is of datetime type
-df['Date'] = pd.to_datetime(df['Date'])
-
-# Sorting dataframe by Date to ensure proper animation sequence
-df = df.sort_values(by='Date')
-
-# Convert Date column to string without time
-df['Date_str'] = df['Date'].dt.strftime('31st Mar %Y')
-
-# Format the Value column to two decimal places and keep it as a float
-df['Value'] = df['Value'].astype(float).round(2)
-
-# Create a column to hold the value information along with the year
-df['Text'] = df.apply(lambda row: f"<b>{row['Value']:.2f} ({row['Date_str'][-4:]})</b>", axis=1)
-
-# Sidebar for type and metric selection
-selected_type = st.sidebar.selectbox("Select Type", df['Type'].unique())
-
-# Define the order for each type
-center_order = ["Gross Fiscal Deficit", "Net Fiscal Deficit", "Gross Primary Deficit", "Net Primary Deficit",
-				"Revenue Deficit", "Primary Revenue Deficit", "Draw Down Cash Balance", "Net RBI Credit to Center", 
-				"Gross Tax Direct", "Gross Tax Indirect", "Gross Tax Total", "Tax Revenue Net", "Revenue Receipt",
-				"Non Tax Revenue", "Capital Receipt", "Revenue Expenditure", "Interest Payments", "Subsidies", 
-				"Defence (Rev+Cap)", "Capital Expenditure", "Capital Outlay", "Total Expenditure"]
-
-state_order = ["Revenue Deficit","Gross Fiscal Deficit", "Primary Deficit",
-			   "Primary Revenue Deficit", "Conventional Deficit", "Aggregrate Disburse", "Revenue Receipt",
-			   "Tax Receipts", "Non Tax Receipts", "Aggregrate Receipts"]
-
-# Update title based on selection
-if selected_type == "Center":
-	title_text = "SELECT FISCAL INDICATORS OF THE CENTER GOVT (% of gdp)"
-	metric_order = center_order
-else:
-	title_text = "SELECT FISCAL INDICATORS OF THE STATE GOVTs (% of gdp)"
-	metric_order = state_order
-
-st.markdown(f"<h1 style='font-size:25px; margin-top: -60px;'>{title_text.title()}</h1>", unsafe_allow_html=True)
-
-filtered_df = df[df['Type'] == selected_type]
-
-# Set the metric order for the y-axis
-filtered_df['Metric'] = pd.Categorical(filtered_df['Metric'], categories=metric_order, ordered=True)
-filtered_df = filtered_df.sort_values('Metric')
-
-selected_metrics = st.sidebar.multiselect("Select Metrics to Display", filtered_df['Metric'].unique(), default=list(filtered_df['Metric'].unique()))
-
-# Check if any metrics are selected
-if selected_metrics:
-	# Further filter dataframe based on selected metrics
-	filtered_df = filtered_df[filtered_df['Metric'].isin(selected_metrics)]
-
-	# Calculate min and max values for the dotted lines
-	min_value = filtered_df['Value'].min()
-	max_value = filtered_df['Value'].max()
-
-	# Ensure Date_str is ordered correctly
-	filtered_df['Date_str'] = pd.Categorical(filtered_df['Date_str'], ordered=True, categories=sorted(filtered_df['Date_str'].unique(), key=lambda x: datetime.strptime(x, '31st Mar %Y')))
-
-	# Calculate the range for the x-axis
-	range_min = min_value - abs(min_value) * 0.30
-	range_max = max_value + abs(max_value) * 0.15
-
-	# Plotly animation setup
-	fig = px.scatter(filtered_df, x="Value", y="Metric", animation_frame="Date_str", animation_group="Metric",
-					 color="Metric", range_x=[range_min, range_max],
-					 title="", size_max=24, text="Text")
-
-	# Customize text position to the right of the dots
-	fig.update_traces(textposition='middle right', textfont=dict(size=16))
-
-	# Add black outlines to the dots
-	fig.update_traces(marker=dict(size=20, line=dict(width=2, color='black')))
-
-	# Customize y-axis labels font size and make them bold
-	fig.update_yaxes(tickfont=dict(size=20, color='black', family='Arial', weight='bold'))
-
-
-	# Remove y-axis labels and variable labels
-	fig.update_yaxes(showticklabels=True)
-	fig.update_traces(marker=dict(size=24))
-
-	# Draw a black line on the y-axis
-	fig.add_shape(type='line', x0=0, x1=0, y0=0, y1=1, line=dict(color='black', width=1), xref='x', yref='paper')
-
-	# Remove legend on the right side
-	fig.update_layout(showlegend=False)
-
-	# Add black border to the chart
-	# fig.update_xaxes(fixedrange=True, showline=True, linewidth=1.2, linecolor='black', mirror=True)
-	# fig.update_yaxes(fixedrange=True, showline=True, linewidth=1.2, linecolor='black', mirror=True)
-
-	# Add dotted lines for min and max values
-	fig.add_shape(
-		type="line",
-		x0=min_value, y0=0, x1=min_value, y1=1,
-		xref='x', yref='paper',
-		line=dict(color="blue", width=2, dash="dot")
-	)
-	fig.add_shape(
-		type="line",
-		x0=max_value, y0=0, x1=max_value, y1=1,
-		xref='x', yref='paper',
-		line=dict(color="red", width=2, dash="dot")
+# Dataset watcher: loads the workbooks once, then reloads them in the background when they change
+@st.cache_resource
+def datasetwatcher():
+	watcher = fiscal_reload.DatasetWatcher(ingestor(), interval=int(os.environ.get("FISCAL_RELOAD_SECONDS", 30)))
+
+	# Figures of unchanged Types and metrics carry over to the new data version. Views do not:
+	# they point into the old version's store, which they would keep alive uncounted
+	watcher.subscribe(viewcache().expire)
+	watcher.subscribe(figurecache().invalidate)
+	watcher.subscribe(prefetcher().reload)
+	watcher.start()
+	return watcher
+
+# Figure cache shared by all sessions, bounded by entry count and total JSON size
+@st.cache_resource
+def figurecache():
+	return fiscal_cache.FigureCache(
+		max_entries=int(os.environ.get("FIGURE_CACHE_SIZE", 64)),
+		max_bytes=int(os.environ.get("FIGURE_CACHE_MB", 64)) * 1024 * 1024,
 	)
 
-	# Adjust the layout
-	fig.update_layout(
-		xaxis_title="Value as Percentage of GDP",
-		yaxis_title="",
-		width =1200,
-		height=900,  # Adjust the height to make the plot more visible
-		margin=dict(l=0, r=10, t=120, b=40, pad=0),  # Add margins to make the plot more readable and closer to the left
-		sliders=[{
-			'steps': [
-				{
-					'args': [
-						[date_str],
-						{
-							'frame': {'duration': 300, 'redraw': True},
-							'mode': 'immediate',
-							'transition': {'duration': 300}
-						}
-					],
-					'label': date_str,
-					'method': 'animate'
-				}
-				for date_str in sorted(filtered_df['Date_str'].unique(), key=lambda x: datetime.strptime(x, '31st Mar %Y'))
-			],
-			'x': 0.1,
-			'xanchor': 'left',
-			'y': 0,
-			'yanchor': 'top'
-		}]
-	)
+# Background builds of the views likely to be opened next, within PREFETCH_CPU of one core
+# (0 turns prefetching off)
+@st.cache_resource
+def prefetcher():
+	return fiscal_prefetch.Prefetcher(figurecache(), cpu_budget=float(os.environ.get("PREFETCH_CPU", 0.25)))
 
-	# Add initial annotation for the date
-	initial_date_annotation = {
-		'x': 0,
-		'y': 1.15,  # Move the date annotation closer to the top of the chart
-		'xref': 'paper',
-		'yref': 'paper',
-		'text': f'<span style="color:red;font-size:30px"><b>Date: {filtered_df["Date_str"].iloc[0]}</b></span>',
-		'showarrow': False,
-		'font': {
-			'size': 20
-		}
-	}
-	fig.update_layout(annotations=[initial_date_annotation])
-
-	# Custom callback to update the date annotation dynamically
-	def update_annotations(date_str):
-		return [go.layout.Annotation(
-			x=0,
-			y=1.15,
-			xref='paper',
-			yref='paper',
-			text=f'<span style="color:red;font-size:30px"><b>Date: {date_str}</b></span>',
-			showarrow=False,
-			font=dict(size=30)
-		)]
-
-	# Customize y-axis labels font size
-	fig.update_yaxes(tickfont=dict(size=20))
-
-	# Update annotation with each frame
-	for frame in fig.frames:
-		date_str = frame.name
-		frame['layout'].update(annotations=update_annotations(date_str))
-
-	# Ensure the frames are sorted correctly
-	fig.frames = sorted(fig.frames, key=lambda frame: datetime.strptime(frame.name, '31st Mar %Y'))
-
-	# Custom callback to update the date annotation dynamically
-	fig.update_layout(
-		updatemenus=[{
-			'type': 'buttons',
-			'showactive': False,
-			'buttons': [
-				{
-					'label': 'Play',
-					'method': 'animate',
-					'args': [None, {
-						'frame': {'duration': 500, 'redraw': True},
-						'fromcurrent': True,
-						'transition': {'duration': 300, 'easing': 'linear'}
-					}]
-				},
-				{
-					'label': 'Pause',
-					'method': 'animate',
-					'args': [[None], {
-						'frame': {'duration': 0, 'redraw': False},
-						'mode': 'immediate',
-						'transition': {'duration': 0}
-					}]
-				}
-			]
-		}]
+# Selected [metric, year] blocks shared read-only by all sessions; identical (Type, metrics)
+# picks are built once, even when several sessions ask at the same moment
+@st.cache_resource
+def viewcache():
+	return fiscal_cache.SharedCache(
+		max_entries=int(os.environ.get("VIEW_CACHE_SIZE", 256)),
+		max_bytes=int(os.environ.get("VIEW_CACHE_MB", 16)) * 1024 * 1024,
+		sizeof=fiscal_store.selection_bytes,
 	)
 
+# Seed the figure cache with the default views pre-rendered by fiscal_export.py for this data
+# version, when they were rendered with this app's chart engine
+@st.cache_resource(max_entries=2)
+def loadartifacts(data_version):
+	for selected_type, metrics, figure_json in fiscal_export.load_artifacts(data_version, CHART_ENGINE):
+		figurecache().put((data_version, selected_type, frozenset(metrics)), figure_json)
+
+# Per-Type [metric, year] arrays of one data version (the previous version is kept during a swap)
+@st.cache_resource(max_entries=2)
+def metricstore(data_version, _df):
+	return fiscal_store.build_store(_df)
+
+# Page for browser-side filtering, built once per data version and identical for every session
+@st.cache_resource(max_entries=2)
+def clientpage(data_version, _store):
+	return fiscal_client.render_html(_store, data_version)
+
+# Chart engine: plotly.express by default, CHART_ENGINE=direct builds the frames directly
+# and CHART_ENGINE=compact also strips the repeated styling out of every frame
+CHART_ENGINE = os.environ.get("CHART_ENGINE", "express")
+build_figure = fiscal_charts.ENGINES[CHART_ENGINE]
+
+# Debug panel for FISCAL_TRACE=1: this rerun's spans, figure cache statistics and process totals
+def tracepanel(rerun):
+	with st.sidebar.expander("Debug: timings", expanded=False):
+		st.write(f"Rerun {rerun['ms']:.1f} ms, data version {rerun['data_version']}, payload {rerun['payload_bytes']:,} bytes")
+		st.dataframe(pd.DataFrame([("  " * depth + name, ms) for name, depth, ms in rerun["spans"]], columns=["span", "ms"]),
+					 hide_index=True)
+		for name, cache in (("View cache", viewcache()), ("Figure cache", figurecache())):
+			stats = cache.stats()
+			st.write(f"{name}: {stats['hit_rate']:.0%} hits ({stats['hits']}/{stats['hits'] + stats['misses']}), {stats['joined']} joined, "
+					 f"{stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MB, {stats['evictions']} evictions")
+		totals = fiscal_trace.snapshot()["spans"]
+		st.dataframe(pd.DataFrame([(name, count, seconds / count * 1000, longest * 1000) for name, (count, seconds, longest) in totals.items()],
+								  columns=["span", "count", "mean ms", "max ms"]), hide_index=True)
+
+# Main Program Starts Here
+fiscal_trace.begin_rerun()
+
+# Prepared dataset shared read-only by all sessions, swapped for a new version when the workbook changes
+with fiscal_trace.span("dataset"):
+	data_version, df = datasetwatcher().current()
+with fiscal_trace.span("metric store"):
+	store = metricstore(data_version, df)
+	loadartifacts(data_version)
+
+# CLIENT_FILTERING=1 ships the data to the browser once; Type and metric changes then
+# happen in the page and never rerun this script
+if os.environ.get("CLIENT_FILTERING") == "1":
+	components.html(clientpage(data_version, store), height=1250, scrolling=True)
+	st.stop()
+
+# Selected metrics of one Type (array rows, no DataFrame copies), shared across sessions
+def selectview(selected_type, metrics):
+	return viewcache().get_or_compute((data_version, selected_type, frozenset(metrics)), lambda: store[selected_type].select(metrics))
+
+# Year range and frame decimation, as a key suffix: () for every year of the full history,
+# else (first, last, step, threshold); applied to the selections before any figure is built
+def timelinecontrols():
+	first = int(min(type_store.years[0] for type_store in store.values()))
+	last = int(max(type_store.years[-1] for type_store in store.values()))
+	with st.sidebar.expander("Timeline"):
+		first_year, last_year = st.slider("Fiscal years (ending March)", first, last, (first, last))
+		frames = st.radio("Frames", ["Every year", "Every Nth year", "Years with large changes"])
+		step = st.number_input("N", min_value=2, max_value=25, value=5) if frames == "Every Nth year" else 1
+		threshold = st.number_input("Change of more than (% of GDP)", min_value=0.0, value=0.5, step=0.1) if frames == "Years with large changes" else None
+	if (first_year, last_year, step, threshold) == (first, last, 1, None):
+		return ()
+	return (first_year, last_year, int(step), threshold)
+
+# Extremes of each charted metric and the years they occurred, from the statistics index
+def summarytable(selection):
+	column_config = {name: st.column_config.NumberColumn(format="%.2f") for name in ("Min", "Max", "Mean", "Latest")}
+	column_config.update({name: st.column_config.NumberColumn(format="%d") for name in ("Min year", "Max year", "Latest year")})
+	st.dataframe(selection.summary(), hide_index=True, use_container_width=True, column_config=column_config)
+
+def narrowed(selection, timeline):
+	return selection.narrow(*timeline) if timeline else selection
+
+message = "Please select at least one metric to display the chart."
+
+# One Type at a time, or two Types side by side on one slider
+compare = len(store) > 1 and st.sidebar.toggle("Compare two Types")
+
+if compare:
+	types = list(store)
+	left_type = st.sidebar.selectbox("Left panel", types, index=types.index("Center") if "Center" in types else 0)
+	right_type = st.sidebar.selectbox("Right panel", [t for t in types if t != left_type])
+	selected_type = f"{left_type} vs {right_type}"
+
+	st.markdown(f"<h1 style='font-size:25px; margin-top: -60px;'>Compare Fiscal Indicators: {selected_type} (% of GDP)</h1>", unsafe_allow_html=True)
+
+	left_metrics = st.sidebar.multiselect(f"{left_type} Metrics", store[left_type].metrics, default=store[left_type].default_metrics)
+	right_metrics = st.sidebar.multiselect(f"{right_type} Metrics", store[right_type].metrics, default=store[right_type].default_metrics)
+	timeline = timelinecontrols()
+
+	cache_key = None
+	figure_json = ""
+	if left_metrics and right_metrics:
+		left = narrowed(selectview(left_type, left_metrics), timeline)
+		right = narrowed(selectview(right_type, right_metrics), timeline)
+		if not (left.years.size and right.years.size):
+			message = "No values in the selected years."
+		else:
+			# Keyed by the (Type, Metric) pairs of both panels in panel order, so a reload drops it
+			# when any of them changed
+			cache_key = (data_version, None, tuple([(left_type, m) for m in left.metrics] + [(right_type, m) for m in right.metrics])) + timeline
+			with prefetcher().live():
+				figure_json = figurecache().get_or_build(cache_key, lambda: fiscal_charts.build_comparison(left, right))
+			summaries = [left, right]
+else:
+	# Sidebar for type and metric selection
+	selected_type = st.sidebar.selectbox("Select Type", list(store))
+
+	# Update title based on selection
+	title_text = fiscal_data.type_title(selected_type)
+
+	st.markdown(f"<h1 style='font-size:25px; margin-top: -60px;'>{title_text.title()}</h1>", unsafe_allow_html=True)
+
+	# Metrics of the selected Type, in y-axis order
+	type_store = store[selected_type]
+
+	# Derived series (YoY change, rolling averages) are listed after the native metrics but not preselected
+	selected_metrics = st.sidebar.multiselect("Select Metrics to Display", type_store.metrics, default=type_store.default_metrics)
+	timeline = timelinecontrols()
+
+	# Check if any metrics are selected
+	cache_key = None
+	figure_json = ""
+	if selected_metrics:
+		selection = narrowed(selectview(selected_type, selected_metrics), timeline)
+		if not selection.years.size:
+			message = "No values in the selected years."
+		else:
+			# Repeat selections reuse the finished figure instead of rebuilding it
+			cache_key = (data_version, selected_type, frozenset(selected_metrics)) + timeline
+			with prefetcher().live():
+				figure_json = figurecache().get_or_build(cache_key, lambda: build_figure(selection))
+			summaries = [selection]
+
+if figure_json:
 	# Use Streamlit's container to fit the chart properly
-	with st.container():
-		st.plotly_chart(fig, use_container_width=True)
+	with st.container(), fiscal_trace.span("plotly_chart"):
+		st.plotly_chart(json.loads(figure_json), use_container_width=True)
+
+	# Summary table under the chart, one per panel
+	for column, summary in zip(st.columns(len(summaries)), summaries):
+		with column:
+			if len(summaries) > 1:
+				st.markdown(f"**{summary.selected_type}**")
+			summarytable(summary)
 else:
-	st.write("Please select at least one metric to display the chart.")
+	st.write(message)
+
+# Once this view is on screen, build every Type's default view and the most requested
+# single-Type views in the background
+if cache_key is not None:
+	prefetcher().record(cache_key)
+	likely = [(data_version, t, frozenset(store[t].default_metrics)) for t in store] + prefetcher().popular(data_version, 8)
+
+	# Runs on the prefetch thread, so it holds the caches rather than calling the st.cache_resource getters
+	def prefetchbuild(key, views=viewcache(), store=store):
+		selection = views.get_or_compute(key[:3], lambda: store[key[1]].select(list(key[2])))
+		return build_figure(narrowed(selection, key[3:])).to_json()
+
+	prefetcher().schedule([(key, lambda key=key: prefetchbuild(key)) for key in dict.fromkeys(likely)
+						   if key[1] is not None and key != cache_key])
+
+if fiscal_trace.ENABLED:
+	for prefix, cache in (("view_cache", viewcache()), ("figure_cache", figurecache()), ("prefetch", prefetcher())):
+		for name, value in cache.stats().items():
+			fiscal_trace.gauge(f"{prefix}_{name}", value)
+	fiscal_trace.gauge("payload_bytes", len(figure_json))
+	fiscal_trace.count("reruns")
+	tracepanel(fiscal_trace.end_rerun(data_version=data_version, type=selected_type, payload_bytes=len(figure_json)))
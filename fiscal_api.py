@@ -0,0 +1,263 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import fiscal_cache
+import fiscal_data
+import fiscal_ingest
+import fiscal_reload
+import fiscal_store
+
+logger = logging.getLogger(__name__)
+
+# Read-only data endpoint for bulk consumers, next to the Streamlit app:
+#
+#   GET /v1/version                      {"data_version": ...}
+#   GET /v1/types                        every Type with its metrics and fiscal years
+#   GET /v1/series?type=Center&metric=Revenue%20Deficit&metric=...&from=2000&to=2024&format=csv
+#
+# series serves long-format rows (Type, Metric, FY, Date, Value), every Type and metric when
+# type/metric are left out, as json (columnar), csv or arrow (an Arrow IPC stream, needs the
+# optional pyarrow package). Responses are gzip-compressed for clients that accept it and carry
+# an ETag of the data version, query and content coding; encoded bodies are cached until the
+# data changes.
+FORMATS = {
+	"json": "application/json",
+	"csv": "text/csv; charset=utf-8",
+	"arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+class RequestError(ValueError):
+	pass
+
+
+class DataAPI:
+	def __init__(self, watcher, cache_bytes=64 * 1024 * 1024):
+		self.watcher = watcher
+		self._lock = threading.Lock()
+		self._store = (None, None)
+		self.responses = fiscal_cache.SharedCache(max_entries=256, max_bytes=cache_bytes)
+		watcher.subscribe(self.responses.invalidate)
+
+	# Per-Type arrays of the current data version, built once per version
+	def current(self):
+		data_version, df = self.watcher.current()
+		with self._lock:
+			if self._store[0] != data_version:
+				self._store = (data_version, fiscal_store.build_store(df))
+			return self._store
+
+	def types(self):
+		data_version, store = self.current()
+		return data_version, {
+			"data_version": data_version,
+			"types": [{"type": t, "metrics": s.metrics, "years": s.years.astype(int).tolist()} for t, s in store.items()],
+		}
+
+	# (Type, Metric) pairs and the year range a series query asks for
+	def parse_query(self, store, params):
+		types = params.get("type") or list(store)
+		for selected_type in types:
+			if selected_type not in store:
+				raise RequestError(f"unknown type {selected_type!r}")
+		pairs = []
+		for selected_type in types:
+			metrics = params.get("metric") or store[selected_type].metrics
+			missing = [m for m in metrics if m not in store[selected_type].metrics]
+			if missing and "type" in params:
+				raise RequestError(f"unknown metric {missing[0]!r} for type {selected_type!r}")
+			pairs += [(selected_type, m) for m in store[selected_type].metrics if m in metrics]
+		if not pairs:
+			raise RequestError("no metric matches the query")
+		try:
+			first = int(params.get("from", ["-32768"])[-1])
+			last = int(params.get("to", ["32767"])[-1])
+		except ValueError:
+			raise RequestError("from and to must be fiscal years") from None
+		fmt = params.get("format", ["json"])[-1]
+		if fmt not in FORMATS:
+			raise RequestError(f"format must be one of {', '.join(FORMATS)}")
+		return pairs, first, last, fmt
+
+	# Long-format columns of the requested series, rows with a value only
+	def series_columns(self, store, pairs, first, last):
+		columns = {"Type": [], "Metric": [], "FY": [], "Value": []}
+		for selected_type in dict.fromkeys(t for t, _ in pairs):
+			metrics = [m for t, m in pairs if t == selected_type]
+			selection = store[selected_type].select(metrics)
+			keep = (selection.years >= first) & (selection.years <= last)
+			values = selection.values[:, keep]
+			rows, cols = np.nonzero(~np.isnan(values))
+			columns["Type"].append(np.full(len(rows), selected_type, dtype=object))
+			columns["Metric"].append(np.asarray(selection.metrics, dtype=object)[rows])
+			columns["FY"].append(selection.years[keep][cols].astype(np.int16))
+			columns["Value"].append(values[rows, cols])
+		columns = {name: np.concatenate(parts) for name, parts in columns.items()}
+		# Fiscal years end on 31 March
+		years, index = np.unique(columns["FY"], return_inverse=True)
+		columns["Date"] = np.array([f"{year}-03-31" for year in years], dtype="datetime64[D]")[index]
+		return {name: columns[name] for name in ("Type", "Metric", "FY", "Date", "Value")}
+
+	# Bodies leave the data version out (it is in the headers), so invalidate() can carry the
+	# cached bodies of unchanged series over to a new version
+	def encode(self, columns, fmt):
+		if fmt == "json":
+			payload = {
+				"rows": len(columns["Value"]),
+				"columns": {
+					"Type": columns["Type"].tolist(),
+					"Metric": columns["Metric"].tolist(),
+					"FY": columns["FY"].tolist(),
+					"Date": columns["Date"].astype(str).tolist(),
+					"Value": columns["Value"].tolist(),
+				},
+			}
+			return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+		if fmt == "csv":
+			return pd.DataFrame(columns).to_csv(index=False).encode("utf-8")
+		return _arrow_stream(columns)
+
+	# (status, headers, body) for GET /v1/series
+	def series(self, params, if_none_match, accept_gzip):
+		data_version, store = self.current()
+		pairs, first, last, fmt = self.parse_query(store, params)
+
+		# One validator per representation: the gzip and identity bodies differ byte for byte.
+		# Both depend only on the version, query and coding, so a revalidation is answered
+		# before anything is encoded
+		coding = "gzip" if accept_gzip else None
+		query = json.dumps([pairs, first, last, fmt])
+		etag = f'"{data_version}-{hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]}{"-gz" if coding else ""}"'
+		headers = {"ETag": etag, "X-Data-Version": data_version, "Cache-Control": "public, max-age=60", "Vary": "Accept-Encoding"}
+		if etag_matches(etag, if_none_match):
+			return 304, headers, b""
+
+		key = (data_version, None, tuple(pairs), first, last, fmt)
+		body = self.responses.get_or_compute(key, lambda: self.encode(self.series_columns(store, pairs, first, last), fmt))
+		headers["Content-Type"] = FORMATS[fmt]
+		if coding:
+			body = self.responses.get_or_compute(key + (coding,), lambda: gzip.compress(body, 6))
+			headers["Content-Encoding"] = coding
+		return 200, headers, body
+
+
+# If-None-Match: "*" or a comma-separated list of entity tags, compared weakly (W/ ignored)
+def etag_matches(etag, if_none_match):
+	tags = [tag.strip() for tag in if_none_match.split(",") if tag.strip()]
+	return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+# Accept-Encoding lists gzip (or *) without q=0
+def accepts_gzip(accept_encoding):
+	for item in accept_encoding.split(","):
+		coding, _, params = item.partition(";")
+		if coding.strip().lower() in ("gzip", "*"):
+			q = params.replace(" ", "").lower()
+			return not (q.startswith("q=") and q[2:].strip("0.") == "")
+	return False
+
+
+def _arrow_stream(columns):
+	try:
+		import pyarrow as pa
+	except ImportError:
+		raise RequestError("format=arrow needs the pyarrow package on the server") from None
+
+	table = pa.table({
+		"Type": pa.array(columns["Type"], pa.string()).dictionary_encode(),
+		"Metric": pa.array(columns["Metric"], pa.string()).dictionary_encode(),
+		"FY": pa.array(columns["FY"]),
+		"Date": pa.array(columns["Date"]),
+		"Value": pa.array(columns["Value"]),
+	})
+	sink = io.BytesIO()
+	with pa.ipc.new_stream(sink, table.schema) as writer:
+		writer.write_table(table)
+	return sink.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+	server_version = "fiscal-api"
+
+	def do_GET(self):
+		api = self.server.api
+		url = urlsplit(self.path)
+		params = parse_qs(url.query)
+		try:
+			if url.path == "/v1/version":
+				data_version, _ = api.current()
+				self._send_json(200, {"data_version": data_version})
+			elif url.path == "/v1/types":
+				self._send_json(200, api.types()[1])
+			elif url.path == "/v1/series":
+				if_none_match = self.headers.get("If-None-Match", "")
+				accept_gzip = accepts_gzip(self.headers.get("Accept-Encoding", ""))
+				status, headers, body = api.series(params, if_none_match, accept_gzip)
+				self._send(status, headers, body)
+			else:
+				self._send_json(404, {"error": f"no such endpoint {url.path}"})
+		except RequestError as error:
+			self._send_json(400, {"error": str(error)})
+		except Exception:
+			logger.exception("Serving %s failed", self.path)
+			self._send_json(500, {"error": "internal error"})
+
+	def _send_json(self, status, payload):
+		self._send(status, {"Content-Type": FORMATS["json"], "Cache-Control": "no-cache"},
+				   json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+	def _send(self, status, headers, body):
+		self.send_response(status)
+		for name, value in headers.items():
+			self.send_header(name, value)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		logger.info("%s %s", self.address_string(), format % args)
+
+
+def make_server(api, host="127.0.0.1", port=8502):
+	server = ThreadingHTTPServer((host, port), _Handler)
+	server.daemon_threads = True
+	server.api = api
+	return server
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Serve the prepared fiscal series as JSON, CSV or Arrow.")
+	parser.add_argument("--sources", default=fiscal_ingest.SOURCES_FILE, help="sources file (default: the bundled workbook only)")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8502)
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+	ingestor = fiscal_ingest.Ingestor(fiscal_ingest.read_sources(args.sources), fiscal_data.read_password())
+	watcher = fiscal_reload.DatasetWatcher(ingestor, interval=int(os.environ.get("FISCAL_RELOAD_SECONDS", 30)))
+	watcher.start()
+
+	server = make_server(DataAPI(watcher), args.host, args.port)
+	logger.info("Serving fiscal indicators %s on http://%s:%d/v1/", watcher.current()[0], args.host, args.port)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		watcher.stop()
+		server.server_close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,164 @@
+import threading
+from collections import OrderedDict
+
+import fiscal_trace
+
+
+class _Flight:
+	def __init__(self):
+		self.done = threading.Event()
+		self.value = None
+		self.error = None
+
+
+# Process-wide LRU cache shared by every session, for values that are never modified once
+# built. Bounded both by entry count and by the total size of the stored values (sizeof).
+# Concurrent misses on one key are single-flight: the first caller builds the value, the
+# others wait for it instead of building it again.
+class SharedCache:
+	def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024, sizeof=len):
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.sizeof = sizeof
+		self._entries = OrderedDict()
+		self._sizes = {}
+		self._bytes = 0
+		self._flights = {}
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.joined = 0
+		self.evictions = 0
+
+	def get(self, key):
+		with self._lock:
+			return self._lookup(key)
+
+	# Membership without counting a hit or a miss
+	def __contains__(self, key):
+		with self._lock:
+			return key in self._entries
+
+	def _lookup(self, key):
+		value = self._entries.get(key)
+		if value is None:
+			self.misses += 1
+			return None
+		self._entries.move_to_end(key)
+		self.hits += 1
+		return value
+
+	def put(self, key, value):
+		size = self.sizeof(value)
+		with self._lock:
+			if key in self._entries:
+				self._remove(key)
+			# A value larger than the whole budget is served but never stored
+			if size > self.max_bytes:
+				return
+			self._entries[key] = value
+			self._sizes[key] = size
+			self._bytes += size
+			while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+				self._remove(next(iter(self._entries)))
+				self.evictions += 1
+
+	def _remove(self, key):
+		del self._entries[key]
+		self._bytes -= self._sizes.pop(key)
+
+	# Return the cached value for key, computing and storing it on a miss. Callers missing
+	# the same key while it is being computed wait for that result (or its exception).
+	def get_or_compute(self, key, compute):
+		with self._lock:
+			value = self._lookup(key)
+			if value is not None:
+				return value
+			flight = self._flights.get(key)
+			leader = flight is None
+			if leader:
+				flight = self._flights[key] = _Flight()
+			else:
+				self.joined += 1
+
+		if not leader:
+			flight.done.wait()
+			if flight.error is not None:
+				raise flight.error
+			return flight.value
+
+		try:
+			flight.value = compute()
+			self.put(key, flight.value)
+			return flight.value
+		except BaseException as error:
+			flight.error = error
+			raise
+		finally:
+			with self._lock:
+				del self._flights[key]
+			flight.done.set()
+
+	# Carry entries of old_version over to new_version, dropping those that show any of
+	# the changed (Type, Metric) pairs. Keys are (data version, Type, metrics), or
+	# (data version, None, (Type, Metric) pairs) for views spanning several Types, either
+	# optionally followed by view settings that carry over unchanged.
+	def invalidate(self, old_version, new_version, changed):
+		with self._lock:
+			for key in list(self._entries):
+				version, selected_type, metrics = key[:3]
+				if version != old_version:
+					continue
+				value, size = self._entries.pop(key), self._sizes.pop(key)
+				pairs = metrics if selected_type is None else [(selected_type, metric) for metric in metrics]
+				new_key = (new_version, selected_type, metrics) + key[3:]
+				# A rerun may already have stored new_key, between the watcher publishing the
+				# new version and calling its listeners; that entry is kept
+				if any(pair in changed for pair in pairs) or new_key in self._entries:
+					self._bytes -= size
+				else:
+					self._entries[new_key] = value
+					self._sizes[new_key] = size
+
+	# Dataset watcher listener for values tied to one version's data, e.g. views of a store
+	# block: drop every entry of old_version instead of carrying it over
+	def expire(self, old_version, new_version, changed):
+		with self._lock:
+			for key in [key for key in self._entries if key[0] == old_version]:
+				self._remove(key)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self._sizes.clear()
+			self._bytes = 0
+
+	def stats(self):
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"entries": len(self._entries),
+				"bytes": self._bytes,
+				"hits": self.hits,
+				"misses": self.misses,
+				"joined": self.joined,
+				"evictions": self.evictions,
+				"hit_rate": self.hits / lookups if lookups else 0.0,
+			}
+
+
+# Finished figures stored as Plotly JSON strings
+class FigureCache(SharedCache):
+	def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024):
+		super().__init__(max_entries, max_bytes)
+
+	# Return the cached JSON for key, building and serializing the figure on a miss
+	def get_or_build(self, key, build):
+		return self.get_or_compute(key, lambda: _to_json(build))
+
+
+def _to_json(build):
+	with fiscal_trace.span("build figure"):
+		fig = build()
+	with fiscal_trace.span("to_json"):
+		return fig.to_json()
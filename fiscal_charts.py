@@ -0,0 +1,482 @@
+import gzip
+
+import numpy as np
+
+import fiscal_data
+import fiscal_labels
+
+
+# Build the animated chart for the selected metrics of one Type.
+# selection is a fiscal_store.Selection, with metrics in y-axis order and years in fiscal-year order.
+def build_figure(selection):
+	# plotly.express is slow to import, so only this engine pays for it
+	import plotly.express as px
+	import plotly.graph_objects as go
+
+	filtered_df = selection.to_frame()
+	date_strs = selection.date_strs()
+	annotation_texts = dict(zip(date_strs, fiscal_labels.date_annotations(date_strs).tolist()))
+
+	# Calculate min and max values for the dotted lines
+	min_value, max_value = selection.value_range()
+
+	# Calculate the range for the x-axis
+	range_min = min_value - abs(min_value) * 0.30
+	range_max = max_value + abs(max_value) * 0.15
+
+	# Plotly animation setup
+	# Colours and traces follow the metric order, not the order metrics first appear in the rows
+	fig = px.scatter(filtered_df, x="Value", y="Metric", animation_frame="Date_str", animation_group="Metric",
+					 color="Metric", range_x=[range_min, range_max],
+					 category_orders={"Metric": list(selection.metrics)},
+					 title="", size_max=24, text="Text")
+
+	# Customize text position to the right of the dots
+	fig.update_traces(textposition='middle right', textfont=dict(size=16))
+
+	# Add black outlines to the dots
+	fig.update_traces(marker=dict(size=20, line=dict(width=2, color='black')))
+
+	# Customize y-axis labels font size and make them bold
+	fig.update_yaxes(tickfont=dict(size=20, color='black', family='Arial', weight='bold'))
+
+
+	# Remove y-axis labels and variable labels
+	fig.update_yaxes(showticklabels=True)
+	fig.update_traces(marker=dict(size=24))
+
+	# Draw a black line on the y-axis
+	fig.add_shape(type='line', x0=0, x1=0, y0=0, y1=1, line=dict(color='black', width=1), xref='x', yref='paper')
+
+	# Remove legend on the right side
+	fig.update_layout(showlegend=False)
+
+	# Add black border to the chart
+	# fig.update_xaxes(fixedrange=True, showline=True, linewidth=1.2, linecolor='black', mirror=True)
+	# fig.update_yaxes(fixedrange=True, showline=True, linewidth=1.2, linecolor='black', mirror=True)
+
+	# Add dotted lines for min and max values
+	fig.add_shape(
+		type="line",
+		x0=min_value, y0=0, x1=min_value, y1=1,
+		xref='x', yref='paper',
+		line=dict(color="blue", width=2, dash="dot")
+	)
+	fig.add_shape(
+		type="line",
+		x0=max_value, y0=0, x1=max_value, y1=1,
+		xref='x', yref='paper',
+		line=dict(color="red", width=2, dash="dot")
+	)
+
+	# Adjust the layout
+	fig.update_layout(
+		xaxis_title="Value as Percentage of GDP",
+		yaxis_title="",
+		width =1200,
+		height=900,  # Adjust the height to make the plot more visible
+		margin=dict(l=0, r=10, t=120, b=40, pad=0),  # Add margins to make the plot more readable and closer to the left
+		sliders=[{
+			'steps': [
+				{
+					'args': [
+						[date_str],
+						{
+							'frame': {'duration': 300, 'redraw': True},
+							'mode': 'immediate',
+							'transition': {'duration': 300}
+						}
+					],
+					'label': date_str,
+					'method': 'animate'
+				}
+				for date_str in date_strs
+			],
+			'x': 0.1,
+			'xanchor': 'left',
+			'y': 0,
+			'yanchor': 'top'
+		}]
+	)
+
+	# Add initial annotation for the date
+	initial_date_annotation = {
+		'x': 0,
+		'y': 1.15,  # Move the date annotation closer to the top of the chart
+		'xref': 'paper',
+		'yref': 'paper',
+		'text': annotation_texts[date_strs[0]],
+		'showarrow': False,
+		'font': {
+			'size': 20
+		}
+	}
+	fig.update_layout(annotations=[initial_date_annotation])
+
+	# Custom callback to update the date annotation dynamically
+	def update_annotations(date_str):
+		return [go.layout.Annotation(
+			x=0,
+			y=1.15,
+			xref='paper',
+			yref='paper',
+			text=annotation_texts[date_str],
+			showarrow=False,
+			font=dict(size=30)
+		)]
+
+	# Customize y-axis labels font size
+	fig.update_yaxes(tickfont=dict(size=20))
+
+	# Update annotation with each frame
+	for frame in fig.frames:
+		date_str = frame.name
+		frame['layout'].update(annotations=update_annotations(date_str))
+
+	# Ensure the frames are sorted correctly
+	frame_order = {date_str: i for i, date_str in enumerate(date_strs)}
+	fig.frames = sorted(fig.frames, key=lambda frame: frame_order[frame.name])
+
+	# Custom callback to update the date annotation dynamically
+	fig.update_layout(
+		updatemenus=[{
+			'type': 'buttons',
+			'showactive': False,
+			'buttons': [
+				{
+					'label': 'Play',
+					'method': 'animate',
+					'args': [None, {
+						'frame': {'duration': 500, 'redraw': True},
+						'fromcurrent': True,
+						'transition': {'duration': 300, 'easing': 'linear'}
+					}]
+				},
+				{
+					'label': 'Pause',
+					'method': 'animate',
+					'args': [[None], {
+						'frame': {'duration': 0, 'redraw': False},
+						'mode': 'immediate',
+						'transition': {'duration': 0}
+					}]
+				}
+			]
+		}]
+	)
+
+	return fig
+
+
+# Same chart as build_figure, built straight from the [metric, year] array of the selection
+# in one pass instead of going through plotly.express grouping and patching its frames afterwards.
+# With compact=True the styling lives only in the base traces and each frame carries
+# just the x values, value labels and date annotation, so the payload grows far slower
+# with metrics x years.
+def build_figure_direct(selection, compact=False):
+	import plotly.graph_objects as go
+	import plotly.io as pio
+
+	# Values and labels laid out [date, metric], one row per frame
+	metrics = selection.metrics
+	values = selection.values.T
+	labels = selection.labels().T
+	date_strs = selection.date_strs()
+	annotation_texts = fiscal_labels.date_annotations(date_strs).tolist()
+
+	# Calculate min and max values for the dotted lines
+	min_value, max_value = selection.value_range()
+
+	# Calculate the range for the x-axis
+	range_min = min_value - abs(min_value) * 0.30
+	range_max = max_value + abs(max_value) * 0.15
+
+	# Same palette express picks: the colorway of the default template
+	colors = pio.templates[pio.templates.default].layout.colorway
+
+	# One marker trace per metric for one date, styled like the express traces
+	def frame_traces(row, date_str):
+		traces = []
+		for j, metric in enumerate(metrics):
+			present = not np.isnan(values[row, j])
+			traces.append({
+				'type': 'scatter',
+				'mode': 'markers+text',
+				'name': metric,
+				'legendgroup': metric,
+				'showlegend': True,
+				'orientation': 'h',
+				'x': values[row, j:j + 1] if present else [],
+				'y': [metric] if present else [],
+				'ids': [metric] if present else [],
+				'text': [labels[row, j]] if present else [],
+				'marker': {'color': colors[j % len(colors)], 'symbol': 'circle'},
+				'hovertemplate': f'Metric=%{{y}}<br>Date_str={date_str}<br>Value=%{{x}}<br>Text=%{{text}}<extra></extra>',
+				'xaxis': 'x',
+				'yaxis': 'y',
+			})
+		return traces
+
+	if compact:
+		frames = [
+			{
+				'name': date_str,
+				'traces': list(range(len(metrics))),
+				'data': [{'x': [_json_number(values[row, j])], 'text': [labels[row, j]]} for j in range(len(metrics))],
+				'layout': {'annotations': [date_annotation(annotation_texts[row], 30)]},
+			}
+			for row, date_str in enumerate(date_strs)
+		]
+
+		# Base traces keep every metric on the axis; a missing value is a null x
+		data = [
+			{
+				'type': 'scatter',
+				'mode': 'markers+text',
+				'name': metric,
+				'showlegend': False,
+				'x': [_json_number(values[0, j])],
+				'y': [metric],
+				'ids': [metric],
+				'text': [labels[0, j]],
+				'marker': {'color': colors[j % len(colors)], 'size': 24, 'line': {'width': 2, 'color': 'black'}},
+				'textposition': 'middle right',
+				'textfont': {'size': 16},
+				'hovertemplate': 'Metric=%{y}<br>Value=%{x}<br>Text=%{text}<extra></extra>',
+			}
+			for j, metric in enumerate(metrics)
+		]
+	else:
+		frames = [
+			{
+				'name': date_str,
+				'data': frame_traces(row, date_str),
+				'layout': {'annotations': [date_annotation(annotation_texts[row], 30)]},
+			}
+			for row, date_str in enumerate(date_strs)
+		]
+
+		# The first frame is shown before playback, with the dot styling applied
+		data = frame_traces(0, date_strs[0])
+		for trace in data:
+			trace['marker'].update(size=24, line={'width': 2, 'color': 'black'})
+			trace.update(textposition='middle right', textfont={'size': 16})
+
+	layout = {
+		'xaxis': {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': "Value as Percentage of GDP"}, 'range': [range_min, range_max]},
+		'yaxis': {
+			'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': ""},
+			# Plotly draws categories bottom-up, so reverse to keep the first metric on top
+			'categoryorder': 'array', 'categoryarray': metrics[::-1],
+			'tickfont': {'size': 20, 'color': 'black', 'family': 'Arial', 'weight': 'bold'},
+			'showticklabels': True,
+		},
+		'legend': {'title': {'text': "Metric"}, 'tracegroupgap': 0},
+		'showlegend': False,
+		'width': 1200,
+		'height': 900,
+		'margin': {'l': 0, 'r': 10, 't': 120, 'b': 40, 'pad': 0},
+		'shapes': [
+			# Black line on the y-axis and dotted lines for min and max values
+			{'type': 'line', 'x0': 0, 'x1': 0, 'y0': 0, 'y1': 1, 'xref': 'x', 'yref': 'paper', 'line': {'color': 'black', 'width': 1}},
+			{'type': 'line', 'x0': min_value, 'x1': min_value, 'y0': 0, 'y1': 1, 'xref': 'x', 'yref': 'paper', 'line': {'color': 'blue', 'width': 2, 'dash': 'dot'}},
+			{'type': 'line', 'x0': max_value, 'x1': max_value, 'y0': 0, 'y1': 1, 'xref': 'x', 'yref': 'paper', 'line': {'color': 'red', 'width': 2, 'dash': 'dot'}},
+		],
+		'annotations': [date_annotation(annotation_texts[0], 20)],
+		**playback_controls(date_strs),
+	}
+
+	return go.Figure(data=data, layout=layout, frames=frames)
+
+
+# Slider over the dates and the Play/Pause buttons of the direct engines
+def playback_controls(date_strs):
+	return {
+		'sliders': [{
+			'active': 0,
+			'currentvalue': {'prefix': 'Date_str='},
+			'len': 0.9,
+			'pad': {'b': 10, 't': 60},
+			'steps': [slider_step(date_str) for date_str in date_strs],
+			'x': 0.1,
+			'xanchor': 'left',
+			'y': 0,
+			'yanchor': 'top',
+		}],
+		'updatemenus': [{
+			'type': 'buttons',
+			'direction': 'left',
+			'pad': {'r': 10, 't': 70},
+			'showactive': False,
+			'x': 0.1,
+			'xanchor': 'right',
+			'y': 0,
+			'yanchor': 'top',
+			'buttons': [
+				{
+					'label': 'Play',
+					'method': 'animate',
+					'args': [None, {
+						'frame': {'duration': 500, 'redraw': True},
+						'fromcurrent': True,
+						'transition': {'duration': 300, 'easing': 'linear'}
+					}]
+				},
+				{
+					'label': 'Pause',
+					'method': 'animate',
+					'args': [[None], {
+						'frame': {'duration': 0, 'redraw': False},
+						'mode': 'immediate',
+						'transition': {'duration': 0}
+					}]
+				}
+			]
+		}],
+	}
+
+
+# Slider step that jumps to the frame of one date
+def slider_step(date_str):
+	return {
+		'args': [
+			[date_str],
+			{
+				'frame': {'duration': 300, 'redraw': True},
+				'mode': 'immediate',
+				'transition': {'duration': 300}
+			}
+		],
+		'label': date_str,
+		'method': 'animate'
+	}
+
+
+# Date shown above the chart; text is one of fiscal_labels.date_annotations
+def date_annotation(text, font_size):
+	return {
+		'x': 0,
+		'y': 1.15,
+		'xref': 'paper',
+		'yref': 'paper',
+		'text': text,
+		'showarrow': False,
+		'font': {'size': font_size},
+	}
+
+
+# Plain float for JSON, None (null) for a missing value
+def _json_number(value):
+	return None if np.isnan(value) else float(value)
+
+
+# Size of a serialized figure as sent to the browser, raw and gzip-compressed
+def payload_report(figure_json):
+	raw = figure_json.encode("utf-8")
+	return {"bytes": len(raw), "gzip_bytes": len(gzip.compress(raw))}
+
+
+def build_figure_compact(selection):
+	return build_figure_direct(selection, compact=True)
+
+
+# Two Types side by side on one slider, e.g. Center vs State. Both selections are laid out on
+# the union of their fiscal years in a single pass, and each panel is a single trace holding
+# all its metrics, so every frame carries two traces however many metrics are selected.
+def build_comparison(left, right):
+	import plotly.graph_objects as go
+	import plotly.io as pio
+
+	panels = (left, right)
+	years = np.union1d(left.years, right.years)
+	date_strs = fiscal_data.fiscal_year_labels(years)
+	annotation_texts = fiscal_labels.date_annotations(date_strs).tolist()
+
+	# [metric, year] values and labels of each panel on the shared timeline, NaN/"" where a Type has no value
+	blocks = []
+	for selection in panels:
+		columns = np.searchsorted(years, selection.years)
+		values = np.full((len(selection.metrics), len(years)), np.nan)
+		values[:, columns] = selection.values
+		labels = np.full(values.shape, "", dtype=object)
+		labels[:, columns] = selection.labels()
+		blocks.append((values, labels))
+
+	# One x range for both panels, so the Types compare at the same scale
+	min_value = min(selection.value_range()[0] for selection in panels)
+	max_value = max(selection.value_range()[1] for selection in panels)
+	range_x = [min_value - abs(min_value) * 0.30, max_value + abs(max_value) * 0.15]
+
+	colors = pio.templates[pio.templates.default].layout.colorway
+
+	# Panel titles are part of every frame's annotations, which replace the whole list
+	titles = [
+		{'x': (0.0, 0.54)[k], 'y': 1.04, 'xref': 'paper', 'yref': 'paper', 'xanchor': 'left', 'showarrow': False,
+		 'text': f'<b>{selection.selected_type}</b>', 'font': {'size': 22}}
+		for k, selection in enumerate(panels)
+	]
+
+	def panel_points(k, column):
+		values, labels = blocks[k]
+		return {'x': [_json_number(value) for value in values[:, column]], 'text': labels[:, column].tolist()}
+
+	frames = [
+		{
+			'name': date_str,
+			'traces': [0, 1],
+			'data': [panel_points(0, column), panel_points(1, column)],
+			'layout': {'annotations': titles + [date_annotation(annotation_texts[column], 30)]},
+		}
+		for column, date_str in enumerate(date_strs)
+	]
+
+	data = []
+	shapes = []
+	for k, selection in enumerate(panels):
+		axis = '' if k == 0 else '2'
+		data.append({
+			'type': 'scatter',
+			'mode': 'markers+text',
+			'name': selection.selected_type,
+			'showlegend': False,
+			**panel_points(k, 0),
+			'y': selection.metrics,
+			'ids': selection.metrics,
+			'marker': {'color': [colors[j % len(colors)] for j in range(len(selection.metrics))],
+					   'size': 18, 'line': {'width': 2, 'color': 'black'}},
+			'textposition': 'middle right',
+			'textfont': {'size': 13},
+			'hovertemplate': f'{selection.selected_type}<br>Metric=%{{y}}<br>Value=%{{x}}<extra></extra>',
+			'xaxis': 'x' + axis,
+			'yaxis': 'y' + axis,
+		})
+		# Black line at zero and dotted lines at the panel's own min and max
+		panel_min, panel_max = selection.value_range()
+		for x, color, width, dash in ((0, 'black', 1, 'solid'), (panel_min, 'blue', 2, 'dot'), (panel_max, 'red', 2, 'dot')):
+			shapes.append({'type': 'line', 'x0': x, 'x1': x, 'y0': 0, 'y1': 1, 'xref': 'x' + axis, 'yref': f'y{axis} domain',
+						   'line': {'color': color, 'width': width, 'dash': dash}})
+
+	# Left panel labels its metrics on the left, the right panel on the right
+	tickfont = {'size': 16, 'color': 'black', 'family': 'Arial', 'weight': 'bold'}
+	layout = {
+		'xaxis': {'anchor': 'y', 'domain': [0.0, 0.46], 'title': {'text': "Value as Percentage of GDP"}, 'range': range_x},
+		'xaxis2': {'anchor': 'y2', 'domain': [0.54, 1.0], 'title': {'text': "Value as Percentage of GDP"}, 'range': range_x},
+		'yaxis': {'anchor': 'x', 'categoryorder': 'array', 'categoryarray': left.metrics[::-1], 'tickfont': tickfont},
+		'yaxis2': {'anchor': 'x2', 'side': 'right', 'categoryorder': 'array', 'categoryarray': right.metrics[::-1], 'tickfont': tickfont},
+		'showlegend': False,
+		'height': 900,
+		'margin': {'l': 0, 'r': 0, 't': 140, 'b': 40, 'pad': 0},
+		'shapes': shapes,
+		'annotations': titles + [date_annotation(annotation_texts[0], 20)],
+		**playback_controls(date_strs),
+	}
+
+	return go.Figure(data=data, layout=layout, frames=frames)
+
+
+# Chart engines by name: plotly.express, direct frames, and direct frames with the compact payload
+ENGINES = {
+	"express": build_figure,
+	"direct": build_figure_direct,
+	"compact": build_figure_compact,
+}
@@ -0,0 +1,186 @@
+import base64
+import json
+
+import fiscal_data
+
+
+# CDN copy of the plotly.js bundled with the installed plotly, so the page renders with the
+# same plotly.js as the figures built on the server
+def plotly_js_url():
+	import plotly.offline
+
+	return f"https://cdn.plot.ly/plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+
+
+# Everything the page needs, once: per Type the metric names, fiscal years and the
+# [metric, year] values as a base64 little-endian Float32Array (NaN where missing)
+def build_payload(store, data_version):
+	import plotly.io as pio
+
+	types = []
+	for selected_type, type_store in store.items():
+		types.append({
+			"name": selected_type,
+			"title": fiscal_data.type_title(selected_type).title(),
+			"metrics": type_store.metrics,
+			"defaults": type_store.default_metrics,
+			"years": type_store.years.astype(int).tolist(),
+			"values": base64.b64encode(type_store.values.astype("<f4").tobytes()).decode("ascii"),
+		})
+	# Same palette as the server-side engines
+	colors = list(pio.templates[pio.templates.default].layout.colorway)
+	return {"version": data_version, "colors": colors, "types": types}
+
+
+# Self-contained page that switches Type and toggles metrics in the browser with Plotly.react,
+# building the same animated chart as the compact chart engine
+def render_html(store, data_version):
+	payload = json.dumps(build_payload(store, data_version), separators=(",", ":"))
+	# Keep "</script>" inside metric names from closing the script tag
+	payload = payload.replace("</", "<\\/")
+	return _TEMPLATE.replace("__PLOTLY_JS__", plotly_js_url()).replace("__PAYLOAD__", payload)
+
+
+_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="__PLOTLY_JS__"></script>
+<style>
+	body {margin: 0; font-family: "Source Sans Pro", sans-serif;}
+	#controls {display: flex; gap: 24px; align-items: flex-start; margin-bottom: 8px;}
+	#metrics {columns: 3; font-size: 14px;}
+	#metrics label {display: block; white-space: nowrap;}
+	h1 {font-size: 25px; margin: 0 0 8px 0;}
+</style>
+</head>
+<body>
+<h1 id="title"></h1>
+<div id="controls">
+	<label>Select Type <select id="type"></select></label>
+	<div id="metrics"></div>
+</div>
+<div id="chart"></div>
+<script>
+const DATA = __PAYLOAD__;
+const COLORS = DATA.colors;
+
+// Decode each Type's values once into a Float32Array view
+for (const t of DATA.types) {
+	const bytes = Uint8Array.from(atob(t.values), c => c.charCodeAt(0));
+	t.array = new Float32Array(bytes.buffer);
+	t.selected = new Set(t.defaults);
+}
+
+const typeSelect = document.getElementById("type");
+const metricBox = document.getElementById("metrics");
+DATA.types.forEach((t, i) => typeSelect.add(new Option(t.name, i)));
+
+function current() {
+	return DATA.types[typeSelect.value];
+}
+
+function dateStr(year) {
+	return "31st Mar " + year;
+}
+
+function dateAnnotation(year, size) {
+	return {x: 0, y: 1.15, xref: "paper", yref: "paper", showarrow: false, font: {size: size},
+			text: '<span style="color:red;font-size:30px"><b>Date: ' + dateStr(year) + "</b></span>"};
+}
+
+function label(value, year) {
+	return isNaN(value) ? "" : "<b>" + value.toFixed(2) + " (" + year + ")</b>";
+}
+
+function renderMetrics() {
+	const t = current();
+	metricBox.innerHTML = "";
+	t.metrics.forEach(metric => {
+		const box = document.createElement("input");
+		box.type = "checkbox";
+		box.checked = t.selected.has(metric);
+		box.onchange = () => {
+			box.checked ? t.selected.add(metric) : t.selected.delete(metric);
+			renderChart();
+		};
+		const row = document.createElement("label");
+		row.append(box, " " + metric);
+		metricBox.append(row);
+	});
+}
+
+function renderChart() {
+	const t = current();
+	document.getElementById("title").textContent = t.title;
+	const nYears = t.years.length;
+	const rows = [];
+	t.metrics.forEach((metric, i) => { if (t.selected.has(metric)) rows.push(i); });
+	if (!rows.length) {
+		Plotly.purge("chart");
+		document.getElementById("chart").textContent = "Please select at least one metric to display the chart.";
+		return;
+	}
+
+	// Years with at least one selected value, and the value range over them
+	const cols = [];
+	let min = Infinity, max = -Infinity;
+	for (let c = 0; c < nYears; c++) {
+		let any = false;
+		for (const r of rows) {
+			const v = t.array[r * nYears + c];
+			if (!isNaN(v)) { any = true; min = Math.min(min, v); max = Math.max(max, v); }
+		}
+		if (any) cols.push(c);
+	}
+	const value = (r, c) => t.array[r * nYears + c];
+	const metrics = rows.map(r => t.metrics[r]);
+
+	const data = rows.map((r, j) => ({
+		type: "scatter", mode: "markers+text", name: t.metrics[r], showlegend: false,
+		x: [isNaN(value(r, cols[0])) ? null : value(r, cols[0])], y: [t.metrics[r]], ids: [t.metrics[r]],
+		text: [label(value(r, cols[0]), t.years[cols[0]])],
+		marker: {color: COLORS[j % COLORS.length], size: 24, line: {width: 2, color: "black"}},
+		textposition: "middle right", textfont: {size: 16},
+		hovertemplate: "Metric=%{y}<br>Value=%{x:.2f}<extra></extra>",
+	}));
+	const traces = rows.map((_, j) => j);
+	const frames = cols.map(c => ({
+		name: dateStr(t.years[c]),
+		traces: traces,
+		data: rows.map(r => ({x: [isNaN(value(r, c)) ? null : value(r, c)], text: [label(value(r, c), t.years[c])]})),
+		layout: {annotations: [dateAnnotation(t.years[c], 30)]},
+	}));
+	const step = c => ({
+		method: "animate", label: dateStr(t.years[c]),
+		args: [[dateStr(t.years[c])], {frame: {duration: 300, redraw: true}, mode: "immediate", transition: {duration: 300}}],
+	});
+	const line = (x, color, width, dash) => ({type: "line", x0: x, x1: x, y0: 0, y1: 1, xref: "x", yref: "paper", line: {color: color, width: width, dash: dash}});
+
+	const layout = {
+		xaxis: {title: {text: "Value as Percentage of GDP"}, range: [min - Math.abs(min) * 0.30, max + Math.abs(max) * 0.15]},
+		yaxis: {title: {text: ""}, categoryorder: "array", categoryarray: metrics.slice().reverse(),
+				tickfont: {size: 20, color: "black", family: "Arial", weight: "bold"}},
+		showlegend: false, height: 900, margin: {l: 0, r: 10, t: 120, b: 40, pad: 0},
+		shapes: [line(0, "black", 1, "solid"), line(min, "blue", 2, "dot"), line(max, "red", 2, "dot")],
+		annotations: [dateAnnotation(t.years[cols[0]], 20)],
+		sliders: [{active: 0, currentvalue: {prefix: "Date_str="}, len: 0.9, pad: {b: 10, t: 60},
+				   x: 0.1, xanchor: "left", y: 0, yanchor: "top", steps: cols.map(step)}],
+		updatemenus: [{type: "buttons", direction: "left", pad: {r: 10, t: 70}, showactive: false,
+					   x: 0.1, xanchor: "right", y: 0, yanchor: "top", buttons: [
+			{label: "Play", method: "animate", args: [null, {frame: {duration: 500, redraw: true}, fromcurrent: true, transition: {duration: 300, easing: "linear"}}]},
+			{label: "Pause", method: "animate", args: [[null], {frame: {duration: 0, redraw: false}, mode: "immediate", transition: {duration: 0}}]},
+		]}],
+	};
+
+	document.getElementById("chart").textContent = "";
+	Plotly.react("chart", {data: data, layout: layout, frames: frames, config: {responsive: true}});
+}
+
+typeSelect.onchange = () => { renderMetrics(); renderChart(); };
+renderMetrics();
+renderChart();
+</script>
+</body>
+</html>
+"""
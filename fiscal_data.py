@@ -0,0 +1,388 @@
+import datetime
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import tomllib
+from array import array
+
+import numpy as np
+import pandas as pd
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import fiscal_trace
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK = "goi-fiscal-indicators.xlsx"
+SHEET = "Sheet1"
+CACHE_DIR = os.environ.get("FISCAL_CACHE_DIR", ".cache")
+
+# Snapshot file layout: magic, salt, nonce, then the AES-GCM encrypted npz archive
+SNAPSHOT_MAGIC = b"GFI2"
+SALT_SIZE = 16
+NONCE_SIZE = 12
+KDF_ROUNDS = 100_000
+
+# Define the order for each type
+center_order = ["Gross Fiscal Deficit", "Net Fiscal Deficit", "Gross Primary Deficit", "Net Primary Deficit",
+				"Revenue Deficit", "Primary Revenue Deficit", "Draw Down Cash Balance", "Net RBI Credit to Center", 
+				"Gross Tax Direct", "Gross Tax Indirect", "Gross Tax Total", "Tax Revenue Net", "Revenue Receipt",
+				"Non Tax Revenue", "Capital Receipt", "Revenue Expenditure", "Interest Payments", "Subsidies", 
+				"Defence (Rev+Cap)", "Capital Expenditure", "Capital Outlay", "Total Expenditure"]
+
+state_order = ["Revenue Deficit","Gross Fiscal Deficit", "Primary Deficit",
+			   "Primary Revenue Deficit", "Conventional Deficit", "Aggregrate Disburse", "Revenue Receipt",
+			   "Tax Receipts", "Non Tax Receipts", "Aggregrate Receipts"]
+
+# Type holding the Center + States totals built by fiscal_derived, ordered like the Center metrics
+COMBINED_TYPE = "General Govt"
+
+
+# Workbook password outside Streamlit: DB_PASSWORD, else db_password from .streamlit/secrets.toml
+def read_password(secrets_path=os.path.join(".streamlit", "secrets.toml")):
+	if os.environ.get("DB_PASSWORD"):
+		return os.environ["DB_PASSWORD"]
+	with open(secrets_path, 'rb') as f:
+		return tomllib.load(f)["db_password"]
+
+
+# Decrypted workbooks up to this size stay in memory, larger ones spill to a temporary file
+SPOOL_BYTES = int(os.environ.get("FISCAL_SPOOL_MB", 16)) * 1024 * 1024
+
+
+# One sheet column filled row by row: numbers go straight into a float array, anything
+# else (text, dates) is dictionary-encoded, so each distinct Type, Metric or date is held once
+class _Column:
+	def __init__(self):
+		self.numbers = array('d')
+		self.codes = None
+		self.categories = {}
+
+	def append(self, value):
+		if self.codes is None:
+			if value is None:
+				self.numbers.append(np.nan)
+				return
+			if isinstance(value, (int, float)) and not isinstance(value, bool):
+				self.numbers.append(value)
+				return
+			# First non-numeric value: switch the column to codes, keeping earlier numbers as values
+			self.codes = array('i')
+			for number in self.numbers:
+				self.codes.append(-1 if np.isnan(number) else self.categories.setdefault(number, len(self.categories)))
+			self.numbers = None
+		self.codes.append(-1 if value is None else self.categories.setdefault(value, len(self.categories)))
+
+	def to_array(self):
+		if self.codes is None:
+			return np.frombuffer(self.numbers, dtype=np.float64)
+		codes = np.frombuffer(self.codes, dtype=np.int32)
+		categories = list(self.categories)
+		if categories and all(isinstance(value, (datetime.date, datetime.datetime)) for value in categories):
+			dates = pd.to_datetime(categories).to_numpy()
+			return np.where(codes >= 0, dates[np.maximum(codes, 0)], np.datetime64("NaT"))
+		return pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+
+
+# Peak resident set size of this process so far, in bytes (None where the OS does not report it)
+def peak_rss():
+	# VmHWM on Linux: unlike ru_maxrss it starts afresh in a new program instead of
+	# inheriting the high-water mark of the process that spawned it
+	try:
+		with open("/proc/self/status") as f:
+			for line in f:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1]) * 1024
+	except OSError:
+		pass
+	try:
+		import resource
+	except ImportError:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Kilobytes on Linux, bytes on macOS
+	return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Decrypt the workbook and parse the sheet (the slow path).
+# The decrypted workbook goes to a spooled temporary file (on disk past SPOOL_BYTES) and the
+# sheet is streamed row by row in openpyxl's read-only mode into typed column arrays, so the
+# decrypted bytes, an openpyxl object graph and the frame are never all in memory at once.
+def read_workbook(path, password, sheet_name=SHEET):
+	# Only needed when the snapshot cache misses
+	import msoffcrypto
+	import openpyxl
+
+	with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as excel_content:
+		with fiscal_trace.span("decrypt"), open(path, 'rb') as f:
+			excel = msoffcrypto.OfficeFile(f)
+			excel.load_key(password)
+			excel.decrypt(excel_content)
+		excel_content.seek(0)
+
+		# Loading data from excel file
+		with fiscal_trace.span("read_excel"):
+			workbook = openpyxl.load_workbook(excel_content, read_only=True, data_only=True)
+			try:
+				if sheet_name not in workbook.sheetnames:
+					raise ValueError(f"Worksheet named '{sheet_name}' not found")
+				rows = workbook[sheet_name].iter_rows(values_only=True)
+				header = [str(name) for name in next(rows, ())]
+				columns = [_Column() for _ in header]
+				for row in rows:
+					# Blank rows (often trailing formatting) carry no data
+					if all(value is None for value in row):
+						continue
+					for column, value in zip(columns, row):
+						column.append(value)
+					for column in columns[len(row):]:
+						column.append(None)
+			finally:
+				workbook.close()
+
+	df = pd.DataFrame({name: column.to_array() for name, column in zip(header, columns)}, copy=False)
+	rss = peak_rss()
+	if rss is not None:
+		fiscal_trace.gauge("load_peak_rss_bytes", rss)
+		logger.info("Read %s [%s]: %d rows, peak RSS %.1f MB", path, sheet_name, len(df), rss / 2**20)
+	return df
+
+
+# SHA-256 of the source file, read in 1 MB chunks
+def hash_file(path):
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(1 << 20), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+def _derive_key(password, salt):
+	return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, KDF_ROUNDS)
+
+
+# Encrypt a payload with a key derived from the workbook password
+def encrypt_bytes(payload, password):
+	salt = os.urandom(SALT_SIZE)
+	nonce = os.urandom(NONCE_SIZE)
+	sealed = AESGCM(_derive_key(password, salt)).encrypt(nonce, payload, SNAPSHOT_MAGIC)
+	return SNAPSHOT_MAGIC + salt + nonce + sealed
+
+
+def decrypt_bytes(blob, password):
+	if blob[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+		raise ValueError("Not a fiscal indicators snapshot")
+	start = len(SNAPSHOT_MAGIC)
+	salt = blob[start:start + SALT_SIZE]
+	nonce = blob[start + SALT_SIZE:start + SALT_SIZE + NONCE_SIZE]
+	sealed = blob[start + SALT_SIZE + NONCE_SIZE:]
+	return AESGCM(_derive_key(password, salt)).decrypt(nonce, sealed, SNAPSHOT_MAGIC)
+
+
+# Serialize a frame column by column into an npz archive (no pickled objects). Text columns
+# are stored like _Column builds them: int32 codes (-1 for missing) plus their categories.
+def frame_to_npz(df):
+	arrays = {"columns": np.array([str(c) for c in df.columns])}
+	for i, column in enumerate(df.columns):
+		series = df[column]
+		if series.dtype.kind in "biufcmM":
+			arrays[f"c{i}"] = series.to_numpy()
+		else:
+			categorical = pd.Categorical(series)
+			arrays[f"c{i}"] = categorical.codes.astype(np.int32)
+			arrays[f"k{i}"] = np.array([str(value) for value in categorical.categories], dtype=str)
+	buffer = io.BytesIO()
+	np.savez(buffer, **arrays)
+	return buffer.getvalue()
+
+
+def npz_to_frame(payload):
+	with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+		columns = archive["columns"].tolist()
+		data = {}
+		for i, name in enumerate(columns):
+			if f"k{i}" in archive.files:
+				categories = pd.Index(archive[f"k{i}"].tolist(), dtype=object)
+				data[name] = pd.Categorical.from_codes(archive[f"c{i}"], categories=categories)
+			else:
+				data[name] = archive[f"c{i}"]
+		return pd.DataFrame(data, copy=False)
+
+
+def _cache_paths(path, sheet_name, cache_dir):
+	# Workbooks with the same name in different folders get separate snapshots
+	folder = hashlib.sha1(os.path.dirname(os.path.abspath(path)).encode("utf-8")).hexdigest()[:8]
+	stem = f"{os.path.basename(path)}.{folder}.{sheet_name}"
+	return os.path.join(cache_dir, stem + ".json"), os.path.join(cache_dir, stem + ".snapshot")
+
+
+# Write through a temporary file of this writer's own: the app and the data API share the
+# cache directory and may rewrite the same snapshot at the same time
+def _write_atomic(path, payload):
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".", suffix=".tmp")
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			f.write(payload)
+		os.replace(tmp_path, path)
+	except BaseException:
+		os.unlink(tmp_path)
+		raise
+
+
+def _read_manifest(manifest_path):
+	if not os.path.exists(manifest_path):
+		return None
+	with open(manifest_path) as f:
+		return json.load(f)
+
+
+# SHA-256 of the workbook, taken from the manifest while its size and mtime still match
+def _content_hash(path, stat, manifest):
+	if manifest and manifest["size"] == stat.st_size and manifest["mtime_ns"] == stat.st_mtime_ns:
+		return manifest["sha256"]
+	return hash_file(path)
+
+
+# Data version load_workbook would report, without decrypting anything
+def workbook_version(path=WORKBOOK, sheet_name=SHEET, cache_dir=CACHE_DIR):
+	manifest = _read_manifest(_cache_paths(path, sheet_name, cache_dir)[0])
+	return _content_hash(path, os.stat(path), manifest)[:12]
+
+
+# Load the sheet through the encrypted snapshot cache.
+# Returns (data version, frame). The workbook is only decrypted and parsed again
+# when its content hash changes; an unchanged size and mtime skips hashing entirely.
+# validate(df), when given, checks the sheet and returns the frame to hand back; on the
+# cold path it runs before the snapshot is written, so a sheet it rejects is never cached.
+def load_workbook(path=WORKBOOK, password=None, sheet_name=SHEET, cache_dir=CACHE_DIR, validate=None):
+	if validate is None:
+		validate = _unchanged
+
+	stat = os.stat(path)
+	manifest_path, snapshot_path = _cache_paths(path, sheet_name, cache_dir)
+	manifest = _read_manifest(manifest_path)
+	sha256 = _content_hash(path, stat, manifest)
+	version = sha256[:12]
+
+	if manifest and manifest["sha256"] == sha256 and os.path.exists(snapshot_path):
+		try:
+			with fiscal_trace.span("snapshot"), open(snapshot_path, 'rb') as f:
+				df = npz_to_frame(decrypt_bytes(f.read(), password))
+		except Exception:
+			# Wrong password, truncated or tampered snapshot: fall back to the workbook
+			df = None
+		if df is not None:
+			if manifest["mtime_ns"] != stat.st_mtime_ns:
+				manifest.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+				_write_atomic(manifest_path, json.dumps(manifest).encode("utf-8"))
+			return version, validate(df)
+
+	df = read_workbook(path, password, sheet_name)
+	validated = validate(df)
+
+	# Only persist a snapshot that reads back as exactly this frame
+	payload = frame_to_npz(df)
+	if not npz_to_frame(payload).equals(df):
+		logger.warning("%s [%s] does not round-trip through a snapshot; not caching it", path, sheet_name)
+		return version, validated
+	os.makedirs(cache_dir, exist_ok=True)
+	_write_atomic(snapshot_path, encrypt_bytes(payload, password))
+	manifest = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "rows": len(df)}
+	_write_atomic(manifest_path, json.dumps(manifest).encode("utf-8"))
+	return version, validated
+
+
+def _unchanged(df):
+	return df
+
+
+def _read_only(values):
+	values = np.array(values)
+	values.flags.writeable = False
+	return values
+
+
+# Build the frame every rerun works from, in compact dtypes: categorical Type and Metric
+# (metrics in the order lists), float32 values rounded to two decimals, an int16 fiscal
+# year and Date_str as a categorical of the fiscal-year labels. The "value (year)" text
+# labels are not stored; Selection.labels() builds them for the rows a chart shows.
+# The numeric columns are backed by read-only arrays, so sessions sharing the cached
+# frame cannot modify it in place; they take their own filtered views instead.
+def prepare_dataset(df):
+	# Metrics missing from the order lists keep the order they have in the source rows
+	known = center_order + [m for m in state_order if m not in center_order]
+	metric_categories = known + [m for m in pd.unique(df['Metric'].astype(str)) if m not in known]
+
+	# Integer fiscal-year key (the year each fiscal year ends in); every ordering
+	# of dates, frames and slider steps sorts on this instead of parsing strings
+	fiscal_year = pd.to_datetime(df['Date']).dt.year.to_numpy(dtype=np.int16)
+
+	# Sorting by fiscal year to ensure proper animation sequence
+	order = np.argsort(fiscal_year, kind='stable')
+	fiscal_year = _read_only(fiscal_year[order])
+	types = df['Type'].astype(str).to_numpy()[order]
+	metrics = df['Metric'].astype(str).to_numpy()[order]
+
+	prepared = pd.DataFrame({
+		'Type': pd.Categorical(types, categories=pd.unique(types)),
+		'Metric': pd.Categorical(metrics, categories=metric_categories),
+		# Format the Value column to two decimal places; float32 holds them to 7 significant digits
+		'Value': _read_only(df['Value'].astype(float).round(2).to_numpy(dtype=np.float32)[order]),
+		'FY': fiscal_year,
+	}, copy=False)
+
+	# Fiscal year display strings, as a categorical ordered by fiscal year
+	years = np.unique(fiscal_year)
+	prepared['Date_str'] = pd.Categorical.from_codes(np.searchsorted(years, fiscal_year), categories=fiscal_year_labels(years), ordered=True)
+	return prepared
+
+
+# Memory held by each column of a frame, strings included, and the bytes per row
+def memory_report(df):
+	columns = df.memory_usage(index=False, deep=True)
+	total = int(columns.sum())
+	return {
+		"rows": len(df),
+		"columns": {column: int(size) for column, size in columns.items()},
+		"bytes": total,
+		"bytes_per_row": total / len(df) if len(df) else 0.0,
+	}
+
+
+# Display string of each fiscal year key, e.g. 1991 -> "31st Mar 1991"
+def fiscal_year_labels(years):
+	return [f"31st Mar {year}" for year in years]
+
+
+# Page title for a Type
+def type_title(selected_type):
+	if selected_type == "Center":
+		return "SELECT FISCAL INDICATORS OF THE CENTER GOVT (% of gdp)"
+	if selected_type == COMBINED_TYPE:
+		return "SELECT FISCAL INDICATORS OF THE GENERAL GOVT, CENTER + STATEs (% of gdp)"
+	return "SELECT FISCAL INDICATORS OF THE STATE GOVTs (% of gdp)"
+
+
+# Order of the metrics on the y-axis for a Type
+def metric_order(selected_type):
+	if selected_type in ("Center", COMBINED_TYPE):
+		return center_order
+	return state_order
+
+
+# (Type, Metric) pairs whose values differ between two prepared datasets,
+# including metrics or years that were added or removed
+def changed_metrics(old, new):
+	keys = ['Type', 'Metric', 'FY']
+	merged = pd.merge(
+		old[keys + ['Value']].astype({'Type': str, 'Metric': str}),
+		new[keys + ['Value']].astype({'Type': str, 'Metric': str}),
+		on=keys, how='outer', suffixes=('_old', '_new'),
+	)
+	same = (merged['Value_old'] == merged['Value_new']) | (merged['Value_old'].isna() & merged['Value_new'].isna())
+	changed = merged.loc[~same, ['Type', 'Metric']].drop_duplicates()
+	return set(zip(changed['Type'], changed['Metric']))
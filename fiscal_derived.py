@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from fiscal_data import COMBINED_TYPE, metric_order
+
+# Center metric -> matching State metric, summed into the general government series
+COMBINED_METRICS = {
+	"Gross Fiscal Deficit": "Gross Fiscal Deficit",
+	"Gross Primary Deficit": "Primary Deficit",
+	"Revenue Deficit": "Revenue Deficit",
+	"Primary Revenue Deficit": "Primary Revenue Deficit",
+	"Revenue Receipt": "Revenue Receipt",
+}
+
+YOY_SUFFIX = " (YoY change)"
+ROLLING_WINDOWS = (3, 5)
+
+DERIVED_SUFFIXES = (YOY_SUFFIX,) + tuple(f" ({window}Y avg)" for window in ROLLING_WINDOWS)
+
+
+def is_derived(metric):
+	return metric.endswith(DERIVED_SUFFIXES)
+
+
+# Sort key listing derived metrics after the native ones, grouped by kind, each group in
+# the order of the base metrics
+def derived_sort_key(metric, base_metrics):
+	for kind, suffix in enumerate(DERIVED_SUFFIXES, start=1):
+		base = metric[:-len(suffix)]
+		if metric.endswith(suffix) and base in base_metrics:
+			return (kind, base_metrics.index(base))
+	return (0, 0)
+
+
+# Year-over-year change along the year axis (NaN for the first year)
+def yoy_change(values):
+	change = np.full(values.shape, np.nan)
+	change[:, 1:] = values[:, 1:] - values[:, :-1]
+	return change
+
+
+# Trailing mean over window years, NaN until a full window of values is available
+def rolling_mean(values, window):
+	means = np.full(values.shape, np.nan)
+	if values.shape[1] >= window:
+		means[:, window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window, axis=1).mean(axis=-1)
+	return means
+
+
+def _long_rows(selected_types, metrics, years, values):
+	rows, cols = np.nonzero(~np.isnan(values))
+	return pd.DataFrame({
+		'Date': pd.to_datetime([f"{year}-03-31" for year in years])[cols],
+		'Type': np.asarray(selected_types, dtype=object)[rows],
+		'Metric': np.asarray(metrics, dtype=object)[rows],
+		'Value': values[rows, cols],
+	})
+
+
+# Derived series for a long-format (Date, Type, Metric, Value) frame, as rows in the same format:
+# the Center + States general government totals for matching metrics under COMBINED_TYPE, then
+# the YoY change and 3/5-year rolling means of every native and combined metric.
+def derive(df):
+	fiscal_year = pd.to_datetime(df['Date']).dt.year
+	# Derived from the two-decimal values shown in the chart, so they add up on screen
+	values = df['Value'].astype(float).round(2)
+	wide = pd.DataFrame({'Type': df['Type'].astype(str), 'Metric': df['Metric'].astype(str), 'FY': fiscal_year, 'Value': values})
+	wide = wide.pivot_table(index=['Type', 'Metric'], columns='FY', values='Value', aggfunc='last', sort=False)
+
+	# One column per consecutive fiscal year, so shifts and windows line up with calendar years
+	years = np.arange(fiscal_year.min(), fiscal_year.max() + 1)
+	wide = wide.reindex(columns=years)
+
+	# Rows in y-axis order, so derived metrics are listed in the same order as their base metrics
+	keys = sorted(wide.index, key=lambda key: _position(*key))
+	types = [selected_type for selected_type, _ in keys]
+	metrics = [metric for _, metric in keys]
+	values = wide.loc[keys].to_numpy(dtype=float)
+
+	# General government = Center + the (single) state-level Type
+	row = {key: i for i, key in enumerate(keys)}
+	state_types = [t for t in dict.fromkeys(types) if t not in ("Center", COMBINED_TYPE)]
+	pairs = []
+	if len(state_types) == 1:
+		pairs = [(center, state) for center, state in COMBINED_METRICS.items()
+				 if ("Center", center) in row and (state_types[0], state) in row]
+
+	frames = []
+	if pairs:
+		combined = values[[row[("Center", c)] for c, _ in pairs]] + values[[row[(state_types[0], s)] for _, s in pairs]]
+		frames.append(_long_rows([COMBINED_TYPE] * len(pairs), [c for c, _ in pairs], years, combined))
+		types = types + [COMBINED_TYPE] * len(pairs)
+		metrics = metrics + [c for c, _ in pairs]
+		values = np.vstack([values, combined])
+
+	frames.append(_long_rows(types, [metric + YOY_SUFFIX for metric in metrics], years, yoy_change(values)))
+	for window in ROLLING_WINDOWS:
+		frames.append(_long_rows(types, [f"{metric} ({window}Y avg)" for metric in metrics], years, rolling_mean(values, window)))
+	return pd.concat(frames, ignore_index=True)
+
+
+def _position(selected_type, metric):
+	order = metric_order(selected_type)
+	return (selected_type, order.index(metric) if metric in order else len(order), metric)
+
+
+# The long-format frame with its derived rows appended
+def add_derived(df):
+	return pd.concat([df[['Date', 'Type', 'Metric', 'Value']], derive(df)], ignore_index=True)
@@ -0,0 +1,159 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fiscal_charts
+import fiscal_client
+import fiscal_data
+import fiscal_ingest
+import fiscal_reload
+import fiscal_store
+
+ARTIFACT_DIR = os.environ.get("FISCAL_ARTIFACTS", "artifacts")
+
+# plotly.js bundle shared by the pages of one version folder
+PLOTLYJS_FILE = "plotly.min.js"
+
+# Dataset loaded once per worker process
+_worker = {}
+
+
+def _init_worker(sources, password):
+	data_version, df, _ = fiscal_ingest.Ingestor(sources, password).load()
+	_worker.update(data_version=data_version, store=fiscal_store.build_store(fiscal_reload.prepare(df)))
+
+
+def _file_stem(selected_type):
+	return re.sub(r"[^A-Za-z0-9_-]+", "_", selected_type)
+
+
+# Minified page drawing one figure: the figure JSON inline and plotly.js from script_src,
+# or inline when script_src is None
+def _page(title, figure_json, script_src):
+	import plotly.offline
+
+	if script_src is None:
+		script = "<script>" + plotly.offline.get_plotlyjs() + "</script>"
+	else:
+		script = f'<script src="{script_src}"></script>'
+	# Keep "</script>" inside labels from closing the script tag
+	figure_json = figure_json.replace("</", "<\\/")
+	return ('<!DOCTYPE html><html><head><meta charset="utf-8">'
+			f'<meta name="viewport" content="width=device-width,initial-scale=1"><title>{title}</title>{script}'
+			'<style>body{margin:0}</style></head><body><div id="chart"></div>'
+			f'<script>var f={figure_json};f.config={{responsive:true}};Plotly.newPlot("chart",f)</script></body></html>')
+
+
+def _write(path, payload, gzip_copy):
+	with open(path, 'wb') as f:
+		f.write(payload)
+	if gzip_copy:
+		# Precompressed copy for static hosts that serve foo.json.gz for foo.json
+		with open(path + ".gz", 'wb') as f:
+			f.write(gzip.compress(payload, 9, mtime=0))
+	return {"path": os.path.basename(path), "bytes": len(payload), "sha256": hashlib.sha256(payload).hexdigest()}
+
+
+# Render the default view of one Type (all its native metrics) and write the requested formats.
+# JSON is compact, HTML is a minified self-contained page.
+def _render(selected_type, engine, formats, out_dir, script_src=PLOTLYJS_FILE, gzip_copy=False):
+	store = _worker["store"][selected_type]
+	metrics = store.default_metrics
+	figure_json = fiscal_charts.ENGINES[engine](store.select(metrics)).to_json()
+
+	stem = _file_stem(selected_type)
+	files = {}
+	if "json" in formats:
+		files["json"] = _write(os.path.join(out_dir, stem + ".json"), figure_json.encode("utf-8"), gzip_copy)
+	if "html" in formats:
+		page = _page(fiscal_data.type_title(selected_type).title(), figure_json, script_src)
+		files["html"] = _write(os.path.join(out_dir, stem + ".html"), page.encode("utf-8"), gzip_copy)
+	return {"type": selected_type, "metrics": metrics, "stem": stem, "files": files}
+
+
+# Where the pages load plotly.js from: a copy next to them in the version folder (the snapshot
+# then needs nothing outside it), the plotly CDN, or inlined into every page
+def _script_src(plotlyjs, version_dir, gzip_copy):
+	import plotly.offline
+
+	if plotlyjs == "directory":
+		_write(os.path.join(version_dir, PLOTLYJS_FILE), plotly.offline.get_plotlyjs().encode("utf-8"), gzip_copy)
+		return PLOTLYJS_FILE
+	if plotlyjs == "cdn":
+		return fiscal_client.plotly_js_url()
+	return None
+
+
+# Render every Type's default view in parallel into <out_dir>/<data version>/, with an index.json
+# manifest per version and latest.json pointing at the newest one. Version folders never change
+# once written, so a CDN can cache them forever and only latest.json needs a short TTL.
+def export_all(sources, password, out_dir=ARTIFACT_DIR, engine="express", formats=("json", "html"), workers=None,
+			   plotlyjs="directory", gzip_copy=False):
+	# Load once up front so the snapshot cache is warm before the workers start
+	data_version, df, _ = fiscal_ingest.Ingestor(sources, password).load()
+	types = fiscal_reload.prepare(df)['Type'].cat.categories.tolist()
+
+	version_dir = os.path.join(out_dir, data_version)
+	os.makedirs(version_dir, exist_ok=True)
+	script_src = _script_src(plotlyjs, version_dir, gzip_copy) if "html" in formats else None
+	n = len(types)
+	with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(sources, password)) as pool:
+		views = list(pool.map(_render, types, [engine] * n, [formats] * n, [version_dir] * n, [script_src] * n, [gzip_copy] * n))
+
+	manifest = {"data_version": data_version, "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+				"engine": engine, "views": views}
+	with open(os.path.join(version_dir, "index.json"), 'w') as f:
+		json.dump(manifest, f, indent=1)
+
+	# Written last, so it only ever points at a complete version folder
+	latest_path = os.path.join(out_dir, "latest.json")
+	with open(latest_path + ".tmp", 'w') as f:
+		json.dump({"data_version": data_version, "index": f"{data_version}/index.json"}, f)
+	os.replace(latest_path + ".tmp", latest_path)
+	return data_version, views
+
+
+# Pre-rendered figure JSON of one data version as (Type, metrics, figure JSON); nothing when
+# the artifacts were rendered by a different engine than the one asked for
+def load_artifacts(data_version, engine, out_dir=ARTIFACT_DIR):
+	version_dir = os.path.join(out_dir, data_version)
+	index_path = os.path.join(version_dir, "index.json")
+	if not os.path.exists(index_path):
+		return
+	with open(index_path) as f:
+		index = json.load(f)
+	if index.get("engine") != engine:
+		return
+	for view in index["views"]:
+		json_path = os.path.join(version_dir, view["stem"] + ".json")
+		if os.path.exists(json_path):
+			with open(json_path) as f:
+				yield view["type"], view["metrics"], f.read()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Pre-render the default chart of every Type to JSON/HTML artifacts.")
+	parser.add_argument("--sources", default=fiscal_ingest.SOURCES_FILE, help="sources file (default: the bundled workbook only)")
+	parser.add_argument("--out", default=ARTIFACT_DIR)
+	parser.add_argument("--engine", choices=sorted(fiscal_charts.ENGINES), default="express")
+	parser.add_argument("--format", nargs="+", choices=["json", "html"], default=["json", "html"])
+	parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+	parser.add_argument("--plotlyjs", choices=["directory", "cdn", "inline"], default="directory",
+						help="plotly.js for the HTML pages: a copy in the version folder, the plotly CDN, or inlined")
+	parser.add_argument("--gzip", action="store_true", help="also write precompressed .gz copies")
+	args = parser.parse_args()
+
+	data_version, views = export_all(fiscal_ingest.read_sources(args.sources), fiscal_data.read_password(),
+									 args.out, args.engine, tuple(args.format), args.workers, args.plotlyjs, args.gzip)
+	for view in views:
+		sizes = ", ".join(f"{file['path']} {file['bytes']:,} bytes" for file in view["files"].values())
+		print(f"{data_version} {view['type']}: {len(view['metrics'])} metrics -> {sizes}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import fiscal_data
+
+# Optional list of extra workbooks/sheets, e.g.
+#
+#   [[source]]
+#   path = "goi-fiscal-indicators.xlsx"
+#   sheet = "Sheet1"
+#
+#   [[source]]
+#   path = "state-splits.xlsx"
+#   sheet = "Revised Estimates"
+#
+# Without it the app reads Sheet1 of goi-fiscal-indicators.xlsx only.
+SOURCES_FILE = os.environ.get("FISCAL_SOURCES", "sources.toml")
+
+# Long-format schema every source must follow
+SCHEMA_COLUMNS = ['Date', 'Type', 'Metric', 'Value']
+
+
+class SchemaError(ValueError):
+	pass
+
+
+# (path, sheet) pairs from the sources file, or the default workbook
+def read_sources(sources_file=SOURCES_FILE):
+	if not os.path.exists(sources_file):
+		return [(fiscal_data.WORKBOOK, fiscal_data.SHEET)]
+	with open(sources_file, 'rb') as f:
+		config = tomllib.load(f)
+	base = os.path.dirname(os.path.abspath(sources_file))
+	return [(os.path.join(base, source["path"]), source.get("sheet", fiscal_data.SHEET)) for source in config["source"]]
+
+
+# Check a sheet against the long-format schema and return just the schema columns
+def validate_schema(df, source):
+	missing = [column for column in SCHEMA_COLUMNS if column not in df.columns]
+	if missing:
+		raise SchemaError(f"{source}: missing columns {', '.join(missing)}")
+
+	problems = []
+	dates = pd.to_datetime(df['Date'], errors='coerce')
+	if dates.isna().any():
+		problems.append(f"{int(dates.isna().sum())} rows with an invalid Date")
+	values = pd.to_numeric(df['Value'], errors='coerce')
+	if (values.isna() & df['Value'].notna()).any():
+		problems.append(f"{int((values.isna() & df['Value'].notna()).sum())} rows with a non-numeric Value")
+	for column in ('Type', 'Metric'):
+		if df[column].isna().any():
+			problems.append(f"{int(df[column].isna().sum())} rows without a {column}")
+	if problems:
+		raise SchemaError(f"{source}: " + "; ".join(problems))
+
+	return pd.DataFrame({'Date': dates, 'Type': df['Type'], 'Metric': df['Metric'], 'Value': values})
+
+
+# Reads several workbook sheets in parallel and merges them into one long-format frame.
+# Each source keeps its own snapshot and version, so only sources whose file changed
+# are read again; the others are reused from memory.
+class Ingestor:
+	def __init__(self, sources, password, cache_dir=fiscal_data.CACHE_DIR, max_workers=4):
+		self.sources = list(sources)
+		self.password = password
+		self.cache_dir = cache_dir
+		self.max_workers = max_workers
+		self._frames = {}
+		self._lock = threading.Lock()
+
+	def _read(self, source):
+		path, sheet_name = source
+		# Validated inside load_workbook, so a sheet that fails is not written to the snapshot cache
+		return fiscal_data.load_workbook(path, self.password, sheet_name, self.cache_dir,
+										 validate=lambda df: validate_schema(df, f"{path} [{sheet_name}]"))
+
+	# Returns (data version, merged frame, sources that were re-read)
+	def load(self):
+		with self._lock:
+			versions = {source: fiscal_data.workbook_version(*source, self.cache_dir) for source in self.sources}
+			changed = [source for source in self.sources if self._frames.get(source, (None,))[0] != versions[source]]
+
+			if changed:
+				with ThreadPoolExecutor(max_workers=min(self.max_workers, len(changed))) as pool:
+					for source, loaded in zip(changed, pool.map(self._read, changed)):
+						self._frames[source] = loaded
+
+			# Later sources override earlier ones for the same date, Type and metric
+			df = pd.concat([self._frames[source][1] for source in self.sources], ignore_index=True)
+			df = df.drop_duplicates(subset=['Date', 'Type', 'Metric'], keep='last')
+
+			digest = hashlib.sha256()
+			for source in self.sources:
+				digest.update(f"{source[0]}:{source[1]}={self._frames[source][0]}\n".encode("utf-8"))
+			return digest.hexdigest()[:12], df, changed
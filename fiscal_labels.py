@@ -0,0 +1,39 @@
+import numpy as np
+
+# Two digit fractional parts, indexed by cents
+_CENTS = np.array([f"{i:02d}" for i in range(100)])
+
+
+# Element-wise string concatenation of arrays and scalars (broadcast like numpy)
+def concat(*parts):
+	result = np.asarray(parts[0], dtype=str)
+	for part in parts[1:]:
+		result = np.char.add(result, np.asarray(part, dtype=str))
+	return result
+
+
+# Vectorized equivalent of f"{value:.2f}" for values already rounded to two decimals
+def format_values(values):
+	values = np.asarray(values, dtype=float)
+	finite = np.isfinite(values)
+	cents = np.rint(np.abs(np.where(finite, values, 0.0)) * 100).astype(np.int64)
+	text = concat(np.where(np.signbit(values), "-", ""), (cents // 100).astype(str), ".", _CENTS[cents % 100])
+	if not finite.all():
+		# nan/inf are rare enough to format one by one
+		text = np.where(finite, text, np.char.mod("%.2f", values))
+	return text
+
+
+# Calendar year of each date as a string
+def year_strings(dates):
+	return (np.asarray(dates, dtype="datetime64[Y]").astype(np.int64) + 1970).astype(str)
+
+
+# Bold "value (year)" labels shown next to each dot
+def value_labels(values, years):
+	return concat("<b>", format_values(values), " (", years, ")</b>")
+
+
+# Date annotation text shown above the chart, one per frame
+def date_annotations(date_strs):
+	return concat('<span style="color:red;font-size:30px"><b>Date: ', date_strs, '</b></span>')
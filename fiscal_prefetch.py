@@ -0,0 +1,120 @@
+import contextlib
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+# Builds views users are likely to open next into a SharedCache, on one background thread.
+# It never competes with live requests: each build waits until no rerun is building a
+# figure, and after every build the thread rests long enough that prefetching uses at most
+# cpu_budget of one core. A data reload drops everything still queued for the old version.
+class Prefetcher:
+	def __init__(self, cache, cpu_budget=0.25, max_views=256):
+		self.cache = cache
+		self.cpu_budget = cpu_budget
+		self.max_views = max_views
+		self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+		self._lock = threading.Lock()
+		self._idle = threading.Condition(self._lock)
+		self._generation = 0
+		self._pending = set()
+		self._live = 0
+		self._popularity = Counter()
+		self.built = 0
+		self.cancelled = 0
+		self.cpu_seconds = 0.0
+
+	# Count a single-Type view a session asked for; popular() ranks views by these counts.
+	# Once twice max_views are counted, only the max_views most requested stay, with their
+	# counts halved, so one-off timeline settings do not pile up and old favourites fade.
+	def record(self, key):
+		if key[1] is None:
+			return
+		with self._lock:
+			self._popularity[key] += 1
+			if len(self._popularity) > 2 * self.max_views:
+				self._popularity = Counter({view: (count + 1) // 2 for view, count in self._popularity.most_common(self.max_views)})
+
+	# The n most requested views of one data version
+	def popular(self, data_version, n):
+		with self._lock:
+			views = (item for item in self._popularity.items() if item[0][0] == data_version)
+			return [key for key, _ in heapq.nlargest(n, views, key=lambda item: item[1])]
+
+	# Wrap live figure builds; queued prefetches wait until none is running
+	@contextlib.contextmanager
+	def live(self):
+		with self._lock:
+			self._live += 1
+		try:
+			yield
+		finally:
+			with self._lock:
+				self._live -= 1
+				if not self._live:
+					self._idle.notify_all()
+
+	# Queue (key, build) pairs whose key is neither cached nor already queued; build() returns
+	# the value to store under key
+	def schedule(self, tasks):
+		if self.cpu_budget <= 0:
+			return
+		with self._lock:
+			generation = self._generation
+			for key, build in tasks:
+				if key in self._pending or key in self.cache:
+					continue
+				self._pending.add(key)
+				self._pool.submit(self._run, generation, key, build)
+
+	# Dataset watcher listener: stop building for the old version and carry the
+	# request counts of unchanged views over to the new one
+	def reload(self, old_version, new_version, changed):
+		with self._lock:
+			self._generation += 1
+			self._idle.notify_all()
+			popularity = Counter()
+			for key, count in self._popularity.items():
+				version, selected_type, metrics = key[:3]
+				if version == old_version and selected_type is not None and not any((selected_type, m) in changed for m in metrics):
+					popularity[(new_version, selected_type, metrics) + key[3:]] += count
+				elif version == new_version:
+					popularity[key] += count
+			self._popularity = popularity
+
+	def _run(self, generation, key, build):
+		try:
+			with self._lock:
+				while self._live and generation == self._generation:
+					self._idle.wait()
+				if generation != self._generation:
+					self.cancelled += 1
+					return
+			if key in self.cache:
+				return
+
+			start = time.thread_time()
+			try:
+				self.cache.get_or_compute(key, build)
+			except Exception:
+				logger.exception("Prefetching %s failed", key)
+			cpu = time.thread_time() - start
+			with self._lock:
+				self.built += 1
+				self.cpu_seconds += cpu
+		finally:
+			with self._lock:
+				self._pending.discard(key)
+
+		# Rest so that building takes at most cpu_budget of the time
+		time.sleep(cpu * (1 - self.cpu_budget) / self.cpu_budget)
+
+	def stats(self):
+		with self._lock:
+			return {"queued": len(self._pending), "built": self.built, "cancelled": self.cancelled,
+					"cpu_seconds": self.cpu_seconds}
@@ -0,0 +1,70 @@
+import logging
+import threading
+
+import fiscal_data
+import fiscal_derived
+import fiscal_trace
+
+logger = logging.getLogger(__name__)
+
+
+# Prepared dataset of one data version: the source rows plus their derived series
+def prepare(df):
+	with fiscal_trace.span("prepare"):
+		return fiscal_data.prepare_dataset(fiscal_derived.add_derived(df))
+
+
+# Keeps the prepared dataset current without a restart: a background thread polls the
+# source workbooks, rebuilds the dataset off the request path when one changed and swaps
+# it in as a single (version, frame) pair. Subscribers are told which (Type, Metric)
+# pairs changed so they can invalidate only what depends on them.
+class DatasetWatcher:
+	def __init__(self, ingestor, interval=30):
+		self.ingestor = ingestor
+		self.interval = interval
+		self._listeners = []
+		self._stop = threading.Event()
+		self._thread = None
+
+		data_version, df, _ = ingestor.load()
+		self._state = (data_version, prepare(df))
+
+	# The current (data version, prepared frame); read it once per rerun
+	def current(self):
+		return self._state
+
+	# listener(old_version, new_version, changed) runs on the watcher thread after each swap
+	def subscribe(self, listener):
+		self._listeners.append(listener)
+
+	def start(self):
+		if self._thread is None:
+			self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+			self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			try:
+				self.reload()
+			except Exception:
+				# A half-written or invalid workbook: keep serving the current version
+				logger.exception("Reloading the fiscal indicators failed")
+
+	# Rebuild from the sources if any changed; returns True when a new version was swapped in
+	def reload(self):
+		old_version, old_df = self._state
+		data_version, df, changed_sources = self.ingestor.load()
+		if not changed_sources or data_version == old_version:
+			return False
+
+		new_df = prepare(df)
+		changed = fiscal_data.changed_metrics(old_df, new_df)
+		self._state = (data_version, new_df)
+		logger.info("Fiscal indicators reloaded: %s -> %s, %d metrics changed", old_version, data_version, len(changed))
+
+		for listener in self._listeners:
+			listener(old_version, data_version, changed)
+		return True
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+import fiscal_data
+import fiscal_derived
+import fiscal_labels
+
+
+# The selected metrics of one Type as a [metric, year] block, years with no value dropped
+class Selection:
+	def __init__(self, selected_type, metrics, years, values, block=None, stats=None):
+		present = ~np.isnan(values).all(axis=0)
+		if not present.all():
+			years, values = years[present], values[:, present]
+		# Selections are shared between sessions through the view cache
+		values.flags.writeable = False
+		self.selected_type = selected_type
+		self.metrics = metrics
+		self.years = years
+		self.values = values
+		# Memory of its own: nothing when values is a view of the store's block
+		self.nbytes = 0 if block is not None and np.may_share_memory(values, block) else values.nbytes
+		# Per-metric statistics from the store's index, when the selection covers every year
+		self.stats = stats
+
+	# Narrowed timeline: years first..last, then every step-th of them, then, with a threshold,
+	# only years where some metric moved by more than threshold since the last year kept.
+	# Column picks on the [metric, year] block, applied before any figure is built.
+	def narrow(self, first, last, step=1, threshold=None):
+		keep = (self.years >= first) & (self.years <= last)
+		columns = np.flatnonzero(keep)
+		if step > 1 and len(columns):
+			# The last year always stays, so the latest values are shown
+			columns = np.union1d(columns[::step], columns[-1:])
+		if threshold is not None and len(columns):
+			columns = columns[self._changes(self.values[:, columns], threshold)]
+		if len(columns) == len(self.years):
+			return self
+		if len(columns) and columns[-1] - columns[0] + 1 == len(columns):
+			values = self.values[:, columns[0]:columns[-1] + 1]
+		else:
+			values = self.values[:, columns]
+		return Selection(self.selected_type, self.metrics, self.years[columns], values, self.values)
+
+	# Mask of the years to keep: the first and last, and those where any metric moved by more
+	# than threshold, or gained or lost its value, since the last kept year
+	@staticmethod
+	def _changes(values, threshold):
+		keep = np.zeros(values.shape[1], dtype=bool)
+		keep[0] = keep[-1] = True
+		last = values[:, 0]
+		for column in range(1, values.shape[1]):
+			current = values[:, column]
+			if ((np.abs(current - last) > threshold) | (np.isnan(current) != np.isnan(last))).any():
+				keep[column] = True
+				last = current
+		return keep
+
+	# Min and max over every selected value, combined from the per-metric index when there is one
+	def value_range(self):
+		if self.stats is not None:
+			return float(np.nanmin(self.stats['min'])), float(np.nanmax(self.stats['max']))
+		return float(np.nanmin(self.values)), float(np.nanmax(self.values))
+
+	# Extremes of each selected metric and the years they occurred, plus its mean and latest value
+	def summary(self):
+		stats = self.stats if self.stats is not None else metric_stats(self.years, self.values)
+		return pd.DataFrame({
+			'Metric': self.metrics,
+			'Min': stats['min'],
+			'Min year': stats['min_year'],
+			'Max': stats['max'],
+			'Max year': stats['max_year'],
+			'Mean': stats['mean'],
+			'Latest': stats['latest'],
+			'Latest year': stats['latest_year'],
+		})
+
+	def date_strs(self):
+		return fiscal_data.fiscal_year_labels(self.years)
+
+	# Bold "value (year)" labels, same shape as values and empty where there is no value
+	def labels(self):
+		years = np.broadcast_to(self.years.astype(str), self.values.shape)
+		return np.where(np.isnan(self.values), "", fiscal_labels.value_labels(self.values, years))
+
+	# Long-format rows in the layout of the prepared dataset, year by year (then metric), the
+	# order the frames play in, so plotly.express starts its animation on the earliest year
+	def to_frame(self):
+		cols, rows = np.nonzero(~np.isnan(self.values.T))
+		date_strs = self.date_strs()
+		return pd.DataFrame({
+			'Type': self.selected_type,
+			'Metric': pd.Categorical.from_codes(rows, categories=self.metrics, ordered=True),
+			'FY': self.years[cols],
+			'Date_str': pd.Categorical.from_codes(cols, categories=date_strs, ordered=True),
+			'Value': self.values[rows, cols],
+			'Text': self.labels()[rows, cols],
+		})
+
+
+def selection_bytes(selection):
+	return selection.nbytes
+
+
+# Statistics index of a [metric, year] block: per metric the min and max with the year each
+# occurred, the mean, and the latest value with its year. A metric with no value in the block
+# (e.g. outside a narrowed timeline) gets NaN statistics and missing years.
+def metric_stats(years, values):
+	present = ~np.isnan(values)
+	counts = present.sum(axis=1)
+	low = np.where(present, values, np.inf).argmin(axis=1)
+	high = np.where(present, values, -np.inf).argmax(axis=1)
+	# Last year with a value: first hit scanning the reversed years
+	latest = values.shape[1] - 1 - present[:, ::-1].argmax(axis=1)
+	rows = np.arange(len(values))
+	empty = counts == 0
+	empty.flags.writeable = False
+	with np.errstate(invalid='ignore'):
+		mean = np.where(present, values, 0).sum(axis=1) / counts
+	stats = {
+		'min': values[rows, low],
+		'min_year': years[low],
+		'max': values[rows, high],
+		'max_year': years[high],
+		'mean': mean,
+		'latest': values[rows, latest],
+		'latest_year': years[latest],
+	}
+	for column in stats.values():
+		column.flags.writeable = False
+	# argmin/argmax of an all-missing row point at the first year; mask those years out
+	for name in ('min_year', 'max_year', 'latest_year'):
+		stats[name] = pd.arrays.IntegerArray(stats[name], empty)
+	return stats
+
+
+# One Type as a contiguous [metric, year] float array, metrics in y-axis order.
+# Selecting metrics is row indexing and ranges are reductions over the block,
+# with no DataFrame filtering or copies of the long frame.
+class TypeStore:
+	def __init__(self, selected_type, metrics, years, values):
+		values.flags.writeable = False
+		self.selected_type = selected_type
+		self.metrics = metrics
+		self.years = years
+		self.values = values
+		self._rows = {metric: i for i, metric in enumerate(metrics)}
+
+		# Built once per data version; axis ranges and summaries of any metric subset are
+		# combined from it in O(selected metrics)
+		self.stats = metric_stats(years, values)
+
+		# Native metrics are selected by default, derived series are opt-in
+		self.default_metrics = [m for m in metrics if not fiscal_derived.is_derived(m)]
+
+	@classmethod
+	def from_frame(cls, df, selected_type):
+		rows = df[df['Type'] == selected_type]
+		present = set(rows['Metric'].astype(str))
+		metrics = [m for m in fiscal_data.metric_order(selected_type) if m in present]
+		metrics += [m for m in rows['Metric'].cat.categories if m in present and m not in metrics and not fiscal_derived.is_derived(m)]
+		derived = [m for m in rows['Metric'].cat.categories if m in present and fiscal_derived.is_derived(m)]
+		metrics += sorted(derived, key=lambda m: fiscal_derived.derived_sort_key(m, metrics))
+
+		years, year_index = np.unique(rows['FY'].to_numpy(), return_inverse=True)
+		metric_index = pd.Categorical(rows['Metric'].astype(str), categories=metrics).codes
+
+		values = np.full((len(metrics), len(years)), np.nan)
+		# Back to float64 at the two decimals shown, so float32 storage never leaks into labels or hovers
+		values[metric_index, year_index] = rows['Value'].to_numpy(dtype=np.float64).round(2)
+		return cls(selected_type, metrics, years, values)
+
+	# Selected metrics in y-axis order, whatever order they were picked in
+	def select(self, metrics):
+		rows = sorted(self._rows[metric] for metric in metrics if metric in self._rows)
+		# A contiguous run of metrics is a view, anything else a small gathered copy
+		if rows and rows[-1] - rows[0] + 1 == len(rows):
+			values = self.values[rows[0]:rows[-1] + 1]
+		else:
+			values = self.values[rows]
+		stats = {name: column[rows] for name, column in self.stats.items()}
+		return Selection(self.selected_type, [self.metrics[i] for i in rows], self.years, values, self.values, stats)
+
+
+# A TypeStore for every Type of the prepared dataset
+def build_store(df):
+	return {selected_type: TypeStore.from_frame(df, selected_type) for selected_type in df['Type'].cat.categories}
@@ -0,0 +1,136 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# FISCAL_TRACE=1 records timing spans, counters and gauges, logs one JSON line per rerun and
+# keeps a Prometheus text file up to date. Off by default: span() then hands back one shared
+# no-op context manager and nothing is timed, stored or written.
+ENABLED = os.environ.get("FISCAL_TRACE") == "1"
+METRICS_FILE = os.environ.get("FISCAL_METRICS_FILE", os.path.join(os.environ.get("FISCAL_CACHE_DIR", ".cache"), "metrics.prom"))
+
+_NO_SPAN = contextlib.nullcontext()
+
+# Process-wide totals, shared by all sessions and the background threads
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+_gauges = {}
+
+# Spans of the rerun running on this thread
+_local = threading.local()
+
+
+class _Span:
+	__slots__ = ("name", "start", "depth")
+
+	def __init__(self, name):
+		self.name = name
+
+	def __enter__(self):
+		self.depth = getattr(_local, "depth", 0)
+		_local.depth = self.depth + 1
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc):
+		seconds = time.perf_counter() - self.start
+		_local.depth = self.depth
+		with _lock:
+			count, total, longest = _spans.get(self.name, (0, 0.0, 0.0))
+			_spans[self.name] = (count + 1, total + seconds, max(longest, seconds))
+		rerun = getattr(_local, "rerun", None)
+		if rerun is not None:
+			rerun.append((self.start, self.name, self.depth, seconds))
+		return False
+
+
+# Time a block: with fiscal_trace.span("decrypt"): ...
+def span(name):
+	if not ENABLED:
+		return _NO_SPAN
+	return _Span(name)
+
+
+def count(name, n=1):
+	if ENABLED:
+		with _lock:
+			_counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name, value):
+	if ENABLED:
+		with _lock:
+			_gauges[name] = value
+
+
+# Start collecting the spans of a script rerun on this thread
+def begin_rerun():
+	if ENABLED:
+		_local.rerun = []
+		_local.rerun_start = time.perf_counter()
+
+
+# Finish the rerun: log it as one JSON line, refresh the metrics file and return
+# {"ms": total, "spans": [(name, depth, ms), ...], **fields} for the debug panel
+def end_rerun(**fields):
+	rerun = getattr(_local, "rerun", None)
+	if not ENABLED or rerun is None:
+		return None
+	_local.rerun = None
+	total = time.perf_counter() - _local.rerun_start
+	with _lock:
+		count, seconds, longest = _spans.get("rerun", (0, 0.0, 0.0))
+		_spans["rerun"] = (count + 1, seconds + total, max(longest, total))
+
+	record = {"ms": round(total * 1000, 3),
+			  "spans": [(name, depth, round(seconds * 1000, 3)) for _, name, depth, seconds in sorted(rerun)]}
+	record.update(fields)
+	logger.info("rerun %s", json.dumps(record))
+	try:
+		write_metrics()
+	except OSError:
+		logger.exception("Writing %s failed", METRICS_FILE)
+	return record
+
+
+# Process totals: per span (count, total seconds, max seconds), counters and gauges
+def snapshot():
+	with _lock:
+		return {"spans": dict(_spans), "counters": dict(_counters), "gauges": dict(_gauges)}
+
+
+def _label(value):
+	return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Totals in the Prometheus text exposition format, for a node exporter textfile collector
+def prometheus_text():
+	totals = snapshot()
+	lines = [
+		"# HELP fiscal_span_seconds Time spent in each instrumented stage.",
+		"# TYPE fiscal_span_seconds summary",
+	]
+	for name, (count, seconds, _) in sorted(totals["spans"].items()):
+		lines.append(f'fiscal_span_seconds_count{{span="{_label(name)}"}} {count}')
+		lines.append(f'fiscal_span_seconds_sum{{span="{_label(name)}"}} {seconds:.6f}')
+	lines += ["# HELP fiscal_span_seconds_max Longest single run of each stage.", "# TYPE fiscal_span_seconds_max gauge"]
+	for name, (_, _, longest) in sorted(totals["spans"].items()):
+		lines.append(f'fiscal_span_seconds_max{{span="{_label(name)}"}} {longest:.6f}')
+	for name, value in sorted(totals["counters"].items()):
+		lines += [f"# TYPE fiscal_{name}_total counter", f"fiscal_{name}_total {value}"]
+	for name, value in sorted(totals["gauges"].items()):
+		lines += [f"# TYPE fiscal_{name} gauge", f"fiscal_{name} {value}"]
+	return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_FILE):
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	tmp_path = f"{path}.{threading.get_ident()}.tmp"
+	with open(tmp_path, 'w') as f:
+		f.write(prometheus_text())
+	os.replace(tmp_path, path)